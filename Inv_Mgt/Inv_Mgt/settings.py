@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -64,6 +66,7 @@ MIDDLEWARE = [
 
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = list(default_headers) + ['idempotency-key']
 
 
 ROOT_URLCONF = 'Inv_Mgt.urls'
@@ -145,6 +148,19 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Seconds a cart line holds its stock before the reservation expires.
+STOCK_RESERVATION_TTL = 15 * 60
+
+# Seconds a stored response is replayed for a repeated Idempotency-Key.
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# Seconds after which a key whose first request never answered may be claimed
+# again. Keep it above the slowest request that honours Idempotency-Key.
+IDEMPOTENCY_IN_FLIGHT_LEASE = 30
+
+# Uploaded files, e.g. spreadsheets waiting in the background import queue.
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from Inventory_Management.models import CustomUser, Business, Supplier, ItemDetails, UpiDetails, Transaction, Cart, \
-CartItem, PasswordResetRequest, BusinessWorker
+CartItem, PasswordResetRequest, BusinessWorker, DailyItemSales, ImportJob, StockReservation, IdempotencyKey
 
 # Register your models here.
 
@@ -19,6 +19,18 @@ class ItemDetailsAdmin(admin.ModelAdmin):
 class BusinessWorkerAdmin(admin.ModelAdmin):
     list_display = ['worker', 'business']
 
+class DailyItemSalesAdmin(admin.ModelAdmin):
+    list_display = ['business', 'item', 'day', 'units', 'revenue', 'cogs']
+
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['item', 'transaction', 'quantity', 'expires_at']
+
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['user', 'key', 'status_code', 'created_at']
+
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ['user', 'file', 'status', 'rows_processed', 'created_at']
+
 admin.site.register(CustomUser, CustomUserAdmin),
 admin.site.register(BusinessWorker, BusinessWorkerAdmin),
 admin.site.register(Business, BusinessAdmin),
@@ -29,3 +41,7 @@ admin.site.register(Transaction),
 admin.site.register(Cart),
 admin.site.register(CartItem),
 admin.site.register(PasswordResetRequest),
+admin.site.register(DailyItemSales, DailyItemSalesAdmin),
+admin.site.register(ImportJob, ImportJobAdmin),
+admin.site.register(StockReservation, StockReservationAdmin),
+admin.site.register(IdempotencyKey, IdempotencyKeyAdmin),
@@ -0,0 +1,220 @@
+from django.db import transaction as db_transaction
+from django.db.models import Sum, Min, Max, Subquery, OuterRef, F, Value, DecimalField, IntegerField, ExpressionWrapper, Case, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from Inventory_Management.models import ItemDetails, Transaction, DailyItemSales
+
+
+def record_sale(transaction, item, sign=1):
+    if transaction.type != 'sold':
+        return
+    day = timezone.localtime(transaction.created_at).date()
+    business_id = transaction.business_id or item.supplier.business_id
+    rollup, created = DailyItemSales.objects.get_or_create(business_id=business_id, item=item, day=day)
+    DailyItemSales.objects.filter(pk=rollup.pk).update(
+        units=F('units') + sign * transaction.unit,
+        revenue=F('revenue') + sign * transaction.amount,
+        cogs=F('cogs') + sign * item.cogs * transaction.unit,
+    )
+
+
+def update_sales_rollup(transaction, previous_status, item=None):
+    # Must run inside the atomic block that changes the transaction status, so
+    # the rollup never disagrees with the Transaction table.
+    if transaction.type != 'sold' or (previous_status == 'success') == (transaction.status == 'success'):
+        return
+    if item is None:
+        item = ItemDetails.objects.select_related('supplier').get(id=transaction.item_id)
+    record_sale(transaction, item, 1 if transaction.status == 'success' else -1)
+
+
+def update_sales_rollups(transactions, previous_statuses):
+    # Set-based update_sales_rollup for many status changes at once: the
+    # changes are summed per item and day and written with one UPDATE.
+    # transactions need item__supplier loaded; previous_statuses maps pk -> status.
+    totals = {}
+    for transaction in transactions:
+        previous_status = previous_statuses[transaction.pk]
+        if transaction.type != 'sold' or transaction.item is None \
+                or (previous_status == 'success') == (transaction.status == 'success'):
+            continue
+        sign = 1 if transaction.status == 'success' else -1
+        business_id = transaction.business_id or transaction.item.supplier.business_id
+        key = (business_id, transaction.item_id, timezone.localtime(transaction.created_at).date())
+        units, revenue, cogs = totals.get(key, (0, 0, 0))
+        totals[key] = (units + sign * transaction.unit, revenue + sign * transaction.amount,
+                       cogs + sign * transaction.item.cogs * transaction.unit)
+    if not totals:
+        return
+
+    DailyItemSales.objects.bulk_create(
+        [DailyItemSales(business_id=business_id, item_id=item_id, day=day) for business_id, item_id, day in totals],
+        ignore_conflicts=True,
+    )
+    rows = DailyItemSales.objects.filter(item_id__in={key[1] for key in totals}, day__in={key[2] for key in totals})
+    pks = {(row.business_id, row.item_id, row.day): row.pk for row in rows.only('business_id', 'item_id', 'day')}
+
+    def increment(index, output_field):
+        return Case(*[When(pk=pks[key], then=Value(total[index])) for key, total in totals.items()],
+                    default=Value(0), output_field=output_field)
+
+    DailyItemSales.objects.filter(pk__in=[pks[key] for key in totals]).update(
+        units=F('units') + increment(0, IntegerField()),
+        revenue=F('revenue') + increment(1, DecimalField(max_digits=14, decimal_places=2)),
+        cogs=F('cogs') + increment(2, DecimalField(max_digits=14, decimal_places=2)),
+    )
+
+
+def rebuild_sales_rollup(business=None, batch_size=1000):
+    # Recreates the rollup from the transaction history, a range of item ids
+    # per committed batch. The incremental path snapshots cogs at sale time and
+    # transactions do not record it, so a day already in the rollup keeps its
+    # cost per unit; only days missing from it are costed at the current cogs.
+    items = ItemDetails.objects.all()
+    if business is not None:
+        items = items.filter(supplier__business=business)
+    max_pk = items.aggregate(Max('pk'))['pk__max'] or 0
+
+    created = 0
+    last_pk = 0
+    while last_pk < max_pk:
+        with db_transaction.atomic():
+            item_info = {
+                item_id: (cogs, business_id)
+                for item_id, cogs, business_id in items.filter(pk__gt=last_pk, pk__lte=last_pk + batch_size)
+                .values_list('id', 'cogs', 'supplier__business_id')
+            }
+            rollup = DailyItemSales.objects.filter(item_id__in=item_info)
+            unit_costs = {(row.item_id, row.day): row.cogs / row.units for row in rollup if row.units}
+            rollup.delete()
+
+            per_day = (
+                Transaction.objects.filter(status='success', type='sold', item_id__in=item_info)
+                .annotate(day=TruncDate('created_at'))
+                .values('item_id', 'day')
+                .annotate(units=Sum('unit'), revenue=Sum('amount'))
+                .order_by()
+            )
+            batch = [
+                DailyItemSales(business_id=item_info[row['item_id']][1], item_id=row['item_id'], day=row['day'], units=row['units'],
+                               revenue=row['revenue'],
+                               cogs=round(unit_costs.get((row['item_id'], row['day']), item_info[row['item_id']][0]) * row['units'], 2))
+                for row in per_day
+            ]
+            DailyItemSales.objects.bulk_create(batch)
+        created += len(batch)
+        last_pk += batch_size
+    return created
+
+
+def units_sold_on(day, item_ids):
+    rows = DailyItemSales.objects.filter(item_id__in=item_ids, day=day).values_list('item_id', 'units')
+    return dict(rows)
+
+
+def daily_sales(start_date, business=None):
+    rows = DailyItemSales.objects.filter(day__gte=start_date)
+    if business is not None:
+        rows = rows.filter(business=business)
+    return rows
+
+
+def sales_performance(start_date, business=None):
+    # One grouped query over the daily rollup, joined to items and suppliers.
+    per_key = (
+        daily_sales(start_date, business)
+        .values(item_name=F('item__item_name'), distributor=F('item__supplier__distributor_name'), category=F('item__supplier__category'))
+        .annotate(total_units=Sum('units'), total_revenue=Sum('revenue'), total_cogs=Sum('cogs'),
+                  first_day=Min('day'), first_item=Min('item_id'))
+        .exclude(total_units=0)
+        .order_by('first_day', 'first_item')
+    )
+
+    total_revenue = 0
+    total_cogs = 0
+    total_profit_loss = 0
+    sales_data = []
+
+    for row in per_key:
+        revenue = row['total_revenue']
+        cogs = row['total_cogs']
+        profit_loss = revenue - cogs
+
+        total_revenue += revenue
+        total_cogs += cogs
+        total_profit_loss += profit_loss
+
+        sales_data.append({
+            'item_name': row['item_name'],
+            'distributor': row['distributor'],
+            'category': row['category'],
+            'units_sold': row['total_units'],
+            'revenue': revenue,
+            'cogs': cogs,
+            'profit_loss': profit_loss,
+            'profit_loss_percentage': (profit_loss / revenue) * 100 if revenue != 0 else 0,
+        })
+
+    total_profit_loss_percentage = (total_profit_loss / total_revenue) * 100 if total_revenue != 0 else 0
+
+    return {
+        'total_revenue': total_revenue,
+        'total_cogs': total_cogs,
+        'total_profit_loss': total_profit_loss,
+        'total_profit_loss_percentage': total_profit_loss_percentage,
+        'sales_data': sales_data
+    }
+
+
+TOP_ITEMS_METRICS = {
+    'units': 'units_sold',
+    'revenue': 'revenue_total',
+    'profit': 'profit_total',
+}
+
+
+def top_items(year, business=None, metric='units', limit=10):
+    units_sold = (
+        DailyItemSales.objects.filter(item=OuterRef('pk'), day__year=year)
+        .order_by()
+        .values('item')
+        .annotate(total=Sum('units'))
+        .values('total')
+    )
+    items = ItemDetails.objects.select_related('supplier')
+    if business is not None:
+        items = items.filter(supplier__business=business)
+
+    money = DecimalField(max_digits=20, decimal_places=2)
+    ranked = (
+        items.annotate(units_sold=Coalesce(Subquery(units_sold, output_field=IntegerField()), Value(0)))
+        .annotate(
+            revenue_total=ExpressionWrapper(F('units_sold') * F('price'), output_field=money),
+            profit_total=ExpressionWrapper(F('units_sold') * (F('price') - F('cogs')), output_field=money),
+        )
+        .order_by(F(TOP_ITEMS_METRICS[metric]).desc(), 'id')[:limit]
+    )
+
+    ranked_items = []
+    for rank, item in enumerate(ranked, start=1):
+        revenue = item.units_sold * item.price
+        cogs = item.units_sold * item.cogs
+        profit_loss = revenue - cogs
+        profit_loss_percentage = (profit_loss / revenue) * 100 if revenue != 0 else 0
+
+        ranked_items.append({
+            'item_name': item.item_name,
+            'size': item.size,
+            'unit_of_measurement': item.unit_of_measurement,
+            'distributor': item.supplier.distributor_name,
+            'category': item.supplier.category,
+            'units_sold': item.units_sold,
+            'revenue': revenue,
+            'cogs': cogs,
+            'profit_loss': profit_loss,
+            'profit_loss_percentage': profit_loss_percentage,
+            'rank': rank,
+        })
+
+    return ranked_items
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class InventoryManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Inventory_Management'
+
+    def ready(self):
+        from Inventory_Management import signals  # noqa: F401
@@ -0,0 +1,94 @@
+import json
+import time
+from uuid import uuid4
+from hashlib import md5
+
+from django.core.cache import cache
+from django.db import transaction
+
+RESULT_TIMEOUT = 10 * 60
+LOCK_TIMEOUT = 30
+LOCK_POLL_INTERVAL = 0.05
+
+_missing = object()
+
+
+def _version_key(business_id):
+    return f"data-version:{business_id if business_id is not None else 'all'}"
+
+
+def data_version(business_id):
+    key = _version_key(business_id)
+    version = cache.get(key)
+    if version is None:
+        # Seeded from the clock so a version evicted from the cache never comes
+        # back with a value that older results were stored under.
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_data_version(business_id):
+    for key in (_version_key(business_id), _version_key(None)):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), None)
+
+
+def invalidate(business_id):
+    # Bumped again on commit: a request that recomputes between the write and
+    # the commit still sees the old rows, and must not keep serving them.
+    bump_data_version(business_id)
+    transaction.on_commit(lambda: bump_data_version(business_id))
+
+
+def _count(endpoint, outcome):
+    key = f"analytics-cache:{outcome}:{endpoint}"
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def cache_stats(endpoint):
+    return {
+        'hits': cache.get(f"analytics-cache:hits:{endpoint}", 0),
+        'misses': cache.get(f"analytics-cache:misses:{endpoint}", 0),
+    }
+
+
+def cached_result(business_id, endpoint, params, compute, timeout=RESULT_TIMEOUT):
+    digest = md5(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    key = f"analytics:{endpoint}:{business_id}:{data_version(business_id)}:{digest}"
+
+    result = cache.get(key, _missing)
+    if result is not _missing:
+        _count(endpoint, 'hits')
+        return result
+
+    # Only the request holding the lock recomputes; the others wait for its
+    # result instead of all hitting the database at once.
+    lock_key = f"{key}:lock"
+    token = uuid4().hex
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not cache.add(lock_key, token, LOCK_TIMEOUT):
+        time.sleep(LOCK_POLL_INTERVAL)
+        result = cache.get(key, _missing)
+        if result is not _missing:
+            _count(endpoint, 'hits')
+            return result
+        if time.monotonic() > deadline:
+            # Computes anyway, but the lock stays with its holder.
+            token = None
+            break
+
+    _count(endpoint, 'misses')
+    try:
+        result = compute()
+        cache.set(key, result, timeout)
+    finally:
+        if token is not None and cache.get(lock_key) == token:
+            cache.delete(lock_key)
+    return result
@@ -0,0 +1,209 @@
+import csv
+import json
+import shutil
+from itertools import islice
+from pathlib import Path
+
+import openpyxl
+import pyarrow
+import pyarrow.parquet as parquet
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from Inventory_Management.models import Supplier, ItemDetails, Transaction
+from Inventory_Management.imports import column_mapping
+
+CHUNK_SIZE = 2000
+
+TRANSACTION_COLUMNS = [
+    ('transaction_id', 'transaction_id'),
+    ('transaction_ref_id', 'transaction_ref_id'),
+    ('created_at', 'created_at'),
+    ('type', 'type'),
+    ('status', 'status'),
+    ('item_id', 'item_id'),
+    ('item_name', 'item__item_name'),
+    ('unit', 'unit'),
+    ('amount', 'amount'),
+    ('transaction_made_by', 'transaction_made_by__username'),
+]
+
+
+class Echo:
+    # File-like object for csv.writer that hands each line back instead of storing it.
+    def write(self, value):
+        return value
+
+
+def transaction_rows(business, start_date, end_date, status=None):
+    transactions = Transaction.objects.filter(business=business, created_at__date__range=(start_date, end_date))
+    if status:
+        transactions = transactions.filter(status=status)
+    lookups = [lookup for name, lookup in TRANSACTION_COLUMNS]
+    # iterator() streams from a server-side cursor on PostgreSQL instead of
+    # caching the whole result on the queryset.
+    for row in transactions.order_by('created_at', 'id').values_list(*lookups).iterator(chunk_size=CHUNK_SIZE):
+        row = list(row)
+        row[2] = timezone.localtime(row[2]).isoformat()
+        yield row
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+# Import field -> lookup, in the column order of the import sheet.
+CATALOGUE_COLUMNS = [
+    ('business_name', 'supplier__business__business_name'),
+    ('category', 'supplier__category'),
+    ('distributor_name', 'supplier__distributor_name'),
+    ('item_name', 'item_name'),
+    ('item_type', 'item_type'),
+    ('size', 'size'),
+    ('uom', 'unit_of_measurement'),
+    ('quantity', 'quantity'),
+    ('price', 'price'),
+    ('cogs', 'cogs'),
+    ('alert_quantity', 'alert_quantity'),
+    ('additional_info', 'additional_info'),
+    ('imported_date', 'imported_date'),
+]
+
+
+def catalogue_header():
+    # Headers come from the import mapping, so an export can be imported back as is.
+    mapping = column_mapping()
+    return [mapping[field] for field, lookup in CATALOGUE_COLUMNS]
+
+
+def catalogue_rows(business):
+    lookups = [lookup for field, lookup in CATALOGUE_COLUMNS] + ['created_at']
+    items = ItemDetails.objects.filter(supplier__business=business).order_by('id').values_list(*lookups)
+    for row in items.iterator(chunk_size=CHUNK_SIZE):
+        row = list(row)
+        created_at = row.pop()
+        row[11] = json.dumps(row[11] or {})
+        # The import needs a date; items added by hand only have created_at.
+        row[12] = row[12] or created_at
+        yield row
+
+
+def write_catalogue_xlsx(sink, business):
+    # Write-only workbooks flush each row to disk instead of keeping cells in memory.
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Data')
+    sheet.append(catalogue_header())
+    for row in catalogue_rows(business):
+        sheet.append(row)
+    workbook.save(sink)
+
+
+MONEY = pyarrow.decimal128(10, 2)
+
+SNAPSHOT_COLUMNS = {
+    'suppliers': [
+        ('id', 'id', pyarrow.int64()),
+        ('category', 'category', pyarrow.string()),
+        ('distributor_name', 'distributor_name', pyarrow.string()),
+        ('created_date', 'created_date', pyarrow.date32()),
+    ],
+    'items': [
+        ('id', 'id', pyarrow.int64()),
+        ('supplier_id', 'supplier_id', pyarrow.int64()),
+        ('item_name', 'item_name', pyarrow.string()),
+        ('item_type', 'item_type', pyarrow.string()),
+        ('size', 'size', pyarrow.float64()),
+        ('unit_of_measurement', 'unit_of_measurement', pyarrow.string()),
+        ('quantity', 'quantity', pyarrow.int64()),
+        ('alert_quantity', 'alert_quantity', pyarrow.int64()),
+        ('price', 'price', MONEY),
+        ('cogs', 'cogs', MONEY),
+        ('additional_info', 'additional_info', pyarrow.string()),
+        ('imported_date', 'imported_date', pyarrow.date32()),
+        ('created_at', 'created_at', pyarrow.date32()),
+    ],
+    'transactions': [
+        ('id', 'id', pyarrow.int64()),
+        ('transaction_id', 'transaction_id', pyarrow.string()),
+        ('item_id', 'item_id', pyarrow.int64()),
+        ('unit', 'unit', pyarrow.int64()),
+        ('amount', 'amount', MONEY),
+        ('status', 'status', pyarrow.string()),
+        ('type', 'type', pyarrow.string()),
+        ('transaction_made_by', 'transaction_made_by__username', pyarrow.string()),
+        ('created_at', 'created_at', pyarrow.timestamp('us', tz='UTC')),
+        ('updated_at', 'updated_at', pyarrow.timestamp('us', tz='UTC')),
+    ],
+}
+
+
+def snapshot_queryset(table, business):
+    if table == 'suppliers':
+        return Supplier.objects.filter(business=business)
+    if table == 'items':
+        return ItemDetails.objects.filter(supplier__business=business)
+    return Transaction.objects.filter(business=business)
+
+
+def write_parquet(sink, table, business, after_id=0, chunk_size=CHUNK_SIZE):
+    # Each chunk becomes one row group, so only chunk_size rows are held in memory.
+    columns = SNAPSHOT_COLUMNS[table]
+    schema = pyarrow.schema([(name, column_type) for name, lookup, column_type in columns])
+    rows = (
+        snapshot_queryset(table, business).filter(pk__gt=after_id).order_by('pk')
+        .values_list(*[lookup for name, lookup, column_type in columns])
+        .iterator(chunk_size=chunk_size)
+    )
+
+    written = 0
+    last_id = after_id
+    with parquet.ParquetWriter(sink, schema) as writer:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            values = list(zip(*chunk))
+            arrays = []
+            for (name, lookup, column_type), column in zip(columns, values):
+                if name == 'additional_info':
+                    column = [json.dumps(value) if value is not None else None for value in column]
+                arrays.append(pyarrow.array(column, type=column_type))
+            writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+            written += len(chunk)
+            last_id = chunk[-1][0]
+    return written, last_id
+
+
+def write_snapshot(business, directory, incremental=False, chunk_size=CHUNK_SIZE):
+    root = Path(directory) / str(business.id)
+    transactions_dir = root / 'transactions'
+    watermark_path = root / 'watermark.json'
+    root.mkdir(parents=True, exist_ok=True)
+
+    written = {}
+    for table in ('suppliers', 'items'):
+        written[table], last_id = write_parquet(str(root / f'{table}.parquet'), table, business, chunk_size=chunk_size)
+
+    after_id = 0
+    if incremental and watermark_path.exists():
+        after_id = json.loads(watermark_path.read_text())['transaction_id']
+    elif transactions_dir.exists():
+        shutil.rmtree(transactions_dir)
+    transactions_dir.mkdir(exist_ok=True)
+
+    # Parquet files cannot be appended to, so every run adds a new part file.
+    part = transactions_dir / f'part-{after_id:012d}.parquet'
+    written['transactions'], last_id = write_parquet(str(part), 'transactions', business, after_id, chunk_size)
+    if written['transactions'] == 0 and after_id:
+        part.unlink()
+
+    watermark_path.write_text(json.dumps({'transaction_id': last_id, 'exported_at': timezone.now().isoformat()}))
+    return written
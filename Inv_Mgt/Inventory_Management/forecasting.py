@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+import numpy
+from django.utils import timezone
+
+from Inventory_Management.models import ItemDetails, DailyItemSales
+from Inventory_Management.caching import cached_result
+
+HISTORY_DAYS = 365
+SHORT_SPAN = 7
+LONG_SPAN = 30
+ROW_CHUNK_SIZE = 10000
+SALES_DTYPE = numpy.dtype([('item_id', numpy.int64), ('day', 'datetime64[D]'), ('units', numpy.float32)])
+
+
+def ew_weights(span, days):
+    # Exponential weights over `days` columns, oldest first, normalised so the
+    # weighted sum of a row is its average daily sales.
+    alpha = 2 / (span + 1)
+    weights = (1 - alpha) ** numpy.arange(days - 1, -1, -1, dtype=numpy.float64)
+    return (weights / weights.sum()).astype(numpy.float32)
+
+
+def load_sales_matrix(business, end_day, days=HISTORY_DAYS):
+    start_day = end_day - timedelta(days=days - 1)
+    items = list(ItemDetails.objects.filter(supplier__business=business).order_by('id').values_list('id', 'item_name', 'quantity'))
+    item_ids = numpy.fromiter((item[0] for item in items), dtype=numpy.int64, count=len(items))
+
+    # Rows go straight from the cursor into typed arrays, with no Python list
+    # of tuples in between.
+    rows = DailyItemSales.objects.filter(business=business, day__range=(start_day, end_day)).values_list('item_id', 'day', 'units')
+    sales = numpy.fromiter(rows.iterator(chunk_size=ROW_CHUNK_SIZE), dtype=SALES_DTYPE)
+    matrix = numpy.zeros((len(items), days), dtype=numpy.float32)
+    # The rollup has one row per item and day, so plain assignment is enough.
+    matrix[numpy.searchsorted(item_ids, sales['item_id']),
+           (sales['day'] - numpy.datetime64(start_day, 'D')).astype(numpy.int64)] = sales['units']
+
+    return items, matrix
+
+
+def forecast_matrix(matrix, quantities):
+    days = matrix.shape[1]
+    weights = numpy.stack([ew_weights(SHORT_SPAN, days), ew_weights(LONG_SPAN, days)], axis=1)
+    velocities = matrix @ weights
+    # The faster of the two velocities gives the earlier, more cautious stock-out date.
+    velocity = velocities.max(axis=1)
+    quantities = numpy.maximum(numpy.asarray(quantities, dtype=numpy.float32), 0)
+    daystostockout = numpy.full(len(quantities), numpy.inf, dtype=numpy.float32)
+    numpy.divide(quantities, velocity, out=daystostockout, where=velocity > 0)
+    return velocities[:, 0], velocities[:, 1], daystostockout
+
+
+def stockout_forecast(business):
+    # Complete days only, so a quiet morning does not look like zero demand.
+    end_day = timezone.localdate() - timedelta(days=1)
+    return cached_result(business.id, 'stockout-forecast', {'end_day': end_day}, lambda: compute_forecast(business, end_day))
+
+
+def compute_forecast(business, end_day):
+    items, matrix = load_sales_matrix(business, end_day)
+    velocity_7, velocity_30, daystostockout = forecast_matrix(matrix, [item[2] for item in items])
+
+    forecast = []
+    for index in numpy.argsort(daystostockout, kind='stable'):
+        item_id, item_name, quantity = items[index]
+        days = daystostockout[index]
+        forecast.append({
+            'item_id': item_id,
+            'item_name': item_name,
+            'quantity': quantity,
+            'velocity_7': round(float(velocity_7[index]), 2),
+            'velocity_30': round(float(velocity_30[index]), 2),
+            'daystostockout': int(numpy.ceil(days)) if numpy.isfinite(days) else None,
+        })
+
+    return forecast
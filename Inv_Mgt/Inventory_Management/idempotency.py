@@ -0,0 +1,127 @@
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+from hashlib import sha256
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from Inventory_Management.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+WAIT_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+PRUNE_BATCH_SIZE = 5000
+
+
+def key_ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+
+def in_flight_lease():
+    # How long a claim may stay unanswered before it is taken to have died
+    # with its request (worker killed, deploy) and can be claimed again.
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_IN_FLIGHT_LEASE', WAIT_TIMEOUT + 20))
+
+
+def is_abandoned(record):
+    return record.status_code is None and record.created_at < timezone.now() - in_flight_lease()
+
+
+def request_hash(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    digest = sha256(f"{request.method} {request.path}\n{body}".encode())
+    # request.data only carries an upload's file name, so a different file
+    # under the same name would replay the first import; hash the contents.
+    for name, uploads in sorted(request.FILES.lists()):
+        for upload in uploads:
+            digest.update(f"\n{name} {upload.name} {upload.size}\n".encode())
+            for chunk in upload.chunks():
+                digest.update(chunk)
+            upload.seek(0)
+    return digest.hexdigest()
+
+
+def claim(user, key, digest):
+    # Returns (record, created). The claim commits on its own, so concurrent
+    # retries see it at once and wait instead of running the request again.
+    while True:
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(user=user, key=key, request_hash=digest), True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if record is None:
+                continue
+            if record.created_at < timezone.now() - key_ttl() or is_abandoned(record):
+                # An expired key, or an abandoned claim, is free to be used again.
+                IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at, status_code=record.status_code).delete()
+                continue
+            return record, False
+
+
+def replay(record):
+    response = Response(record.response, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(handler):
+    # Runs a write handler at most once per Idempotency-Key and user; repeats
+    # within IDEMPOTENCY_KEY_TTL get the first response back.
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return handler(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"message": f"{HEADER} must be at most 255 characters."}, status=status.HTTP_400_BAD_REQUEST)
+
+        digest = request_hash(request)
+        record, created = claim(request.user, key, digest)
+        if not created:
+            if record.request_hash != digest:
+                return Response({"message": f"{HEADER} was already used for a different request."},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            deadline = time.monotonic() + WAIT_TIMEOUT
+            while record.status_code is None and time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                record = IdempotencyKey.objects.filter(pk=record.pk).first()
+                if record is None or is_abandoned(record):
+                    # The first request failed and gave up its claim, or died
+                    # holding it; run this one instead.
+                    return wrapper(self, request, *args, **kwargs)
+            if record.status_code is None:
+                return Response({"message": f"A request with this {HEADER} is still being processed."},
+                                status=status.HTTP_409_CONFLICT)
+            return replay(record)
+
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except BaseException:
+            IdempotencyKey.objects.filter(pk=record.pk).delete()
+            raise
+
+        if response.status_code >= 500:
+            # Server errors may succeed on retry, so they are not stored.
+            IdempotencyKey.objects.filter(pk=record.pk).delete()
+        else:
+            IdempotencyKey.objects.filter(pk=record.pk).update(status_code=response.status_code, response=response.data)
+        return response
+
+    return wrapper
+
+
+def prune_idempotency_keys(batch_size=PRUNE_BATCH_SIZE):
+    # Deletes expired keys a batch of primary keys at a time, oldest first.
+    cutoff = timezone.now() - key_ttl()
+    pruned = 0
+    while True:
+        pks = list(IdempotencyKey.objects.filter(created_at__lt=cutoff).order_by('created_at').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return pruned
+        pruned += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
@@ -0,0 +1,352 @@
+import json
+import math
+from decimal import Decimal
+from datetime import date, datetime
+from itertools import islice
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+import pyarrow
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as parquet
+from django.conf import settings
+from django.db import transaction
+
+from Inventory_Management.models import Business, Supplier, ItemDetails, item_fingerprint
+from Inventory_Management.caching import invalidate
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 5000
+
+UPDATE_FIELDS = ['quantity', 'price', 'cogs', 'alert_quantity', 'imported_date']
+
+
+# Import field -> column header in the uploaded file. Override per deployment
+# with the IMPORT_COLUMN_MAPPING setting, or per upload with column_mapping.
+COLUMN_MAPPING = {
+    'business_name': 'Business',
+    'category': 'Category',
+    'distributor_name': 'Distributor Name',
+    'item_name': 'Item Name',
+    'item_type': 'Item Type',
+    'size': 'Size',
+    'uom': 'Uom',
+    'quantity': 'Quantity',
+    'price': 'Price',
+    'cogs': 'COGS',
+    'alert_quantity': 'Alert',
+    'additional_info': 'Additional Info',
+    'imported_date': 'Date',
+}
+
+FORMATS = ['xlsx', 'csv', 'tsv', 'parquet']
+
+
+def column_mapping(overrides=None):
+    mapping = dict(COLUMN_MAPPING)
+    mapping.update(getattr(settings, 'IMPORT_COLUMN_MAPPING', {}))
+    if overrides:
+        unknown = set(overrides) - set(COLUMN_MAPPING)
+        if unknown:
+            raise ValueError(f"Unknown import fields in column mapping: {', '.join(sorted(unknown))}")
+        mapping.update(overrides)
+    return mapping
+
+
+def detect_format(name, head=b''):
+    extension = Path(name or '').suffix.lower().lstrip('.')
+    if extension in ('xlsx', 'xlsm'):
+        return 'xlsx'
+    if extension in FORMATS:
+        return extension
+    if head.startswith(b'PK'):
+        return 'xlsx'
+    if head.startswith(b'PAR1'):
+        return 'parquet'
+    first_line = head.split(b'\n', 1)[0]
+    return 'tsv' if first_line.count(b'\t') > first_line.count(b',') else 'csv'
+
+
+def file_format(uploaded_file):
+    head = uploaded_file.read(2048)
+    uploaded_file.seek(0)
+    return detect_format(getattr(uploaded_file, 'name', ''), head)
+
+
+def check_columns(columns, mapping):
+    missing = [header for header in mapping.values() if header not in columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+
+def to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.strip()).date()
+    return value.date()
+
+
+TEXT_FIELDS = ['business_name', 'category', 'distributor_name', 'item_name', 'item_type', 'uom']
+
+
+def text(value):
+    return str(value) if value is not None else value
+
+
+def clean_row(values):
+    # Normalises one row, keyed by import field, whichever reader produced it.
+    # Text fields are read back from the database as str, so e.g. an item named
+    # 500 must be fingerprinted as '500' to be found again.
+    info = values['additional_info']
+    if isinstance(info, str):
+        info = json.loads(info) if info.strip() else {}
+    elif info is None or (isinstance(info, float) and math.isnan(info)):
+        info = {}
+    return {
+        'business_name': text(values['business_name']),
+        'category': text(values['category']),
+        'distributor_name': text(values['distributor_name']),
+        'item_name': text(values['item_name']),
+        'item_type': text(values['item_type']),
+        'size': values['size'],
+        'uom': text(values['uom']),
+        'quantity': values['quantity'],
+        'price': values['price'] if not pd.isna(values['price']) else 0.00,
+        'cogs': values['cogs'] if not pd.isna(values['cogs']) else 0.00,
+        'alert_quantity': values['alert_quantity'],
+        'additional_info': info,
+        'imported_date': to_date(values['imported_date']),
+    }
+
+
+def parse_excel_rows(df, mapping=None):
+    mapping = mapping or column_mapping()
+    check_columns(df.columns, mapping)
+    fields = list(mapping)
+    for values in df[list(mapping.values())].itertuples(index=False, name=None):
+        yield clean_row(dict(zip(fields, values)))
+
+
+def read_excel_rows(excel_file, mapping=None):
+    # openpyxl's read-only mode parses the sheet lazily, so only the current row
+    # is held in memory.
+    mapping = mapping or column_mapping()
+    workbook = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        sheet = workbook['Data'] if 'Data' in workbook.sheetnames else workbook.worksheets[0]
+        sheet_rows = sheet.iter_rows(values_only=True)
+        header = {name: index for index, name in enumerate(next(sheet_rows))}
+        check_columns(header, mapping)
+        positions = [(field, header[name]) for field, name in mapping.items()]
+        for values in sheet_rows:
+            if all(value is None for value in values):
+                continue
+            yield clean_row({field: values[index] for field, index in positions})
+    finally:
+        workbook.close()
+
+
+def read_batches(batches, mapping):
+    # Arrow record batches are decoded one at a time, so memory stays bounded
+    # by the batch size rather than the file size.
+    fields = list(mapping)
+    for batch in batches:
+        check_columns(batch.schema.names, mapping)
+        columns = [batch.column(name).to_pylist() for name in mapping.values()]
+        for values in zip(*columns):
+            yield clean_row(dict(zip(fields, values)))
+
+
+def read_csv_rows(source, delimiter=',', mapping=None):
+    mapping = mapping or column_mapping()
+    # Text columns stay strings, so e.g. a numeric item name is not coerced.
+    text_columns = TEXT_FIELDS + ['additional_info']
+    reader = pa_csv.open_csv(
+        source,
+        parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+        convert_options=pa_csv.ConvertOptions(column_types={mapping[field]: pyarrow.string() for field in text_columns}),
+    )
+    return read_batches(reader, mapping)
+
+
+def read_parquet_rows(source, mapping=None):
+    mapping = mapping or column_mapping()
+    parquet_file = parquet.ParquetFile(source)
+    check_columns(parquet_file.schema_arrow.names, mapping)
+    return read_batches(parquet_file.iter_batches(columns=list(mapping.values())), mapping)
+
+
+def read_rows(source, file_format, mapping=None):
+    if file_format == 'xlsx':
+        return read_excel_rows(source, mapping)
+    if file_format == 'csv':
+        return read_csv_rows(source, ',', mapping)
+    if file_format == 'tsv':
+        return read_csv_rows(source, '\t', mapping)
+    if file_format == 'parquet':
+        return read_parquet_rows(source, mapping)
+    raise ValueError(f"Unsupported file format: {file_format}")
+
+
+def resolve_suppliers(rows, create=True):
+    # With create=False, suppliers missing from the database are left unsaved.
+    business_names = {row['business_name'] for row in rows}
+    businesses = Business.objects.in_bulk(business_names, field_name='business_name')
+    if len(businesses) != len(business_names):
+        raise Business.DoesNotExist("Business matching query does not exist.")
+
+    suppliers = {
+        (supplier.business_id, supplier.category, supplier.distributor_name): supplier
+        for supplier in Supplier.objects.filter(business__in=businesses.values())
+    }
+    new_suppliers = {}
+    for row in rows:
+        key = (businesses[row['business_name']].id, row['category'], row['distributor_name'])
+        if key not in suppliers and key not in new_suppliers:
+            new_suppliers[key] = Supplier(business_id=key[0], category=key[1], distributor_name=key[2])
+    if create:
+        Supplier.objects.bulk_create(new_suppliers.values(), batch_size=BATCH_SIZE)
+    suppliers.update(new_suppliers)
+
+    for row in rows:
+        row['supplier'] = suppliers[(businesses[row['business_name']].id, row['category'], row['distributor_name'])]
+
+
+def match_items(rows, create_suppliers=True):
+    # Fingerprints every row and loads the items they already match, a batch
+    # of fingerprints per query.
+    resolve_suppliers(rows, create=create_suppliers)
+    for row in rows:
+        supplier = row['supplier']
+        # A supplier that is not saved yet has no items, so any stand-in id
+        # that keeps its rows apart from other suppliers will do.
+        supplier_id = supplier.id if supplier.id is not None else f"new:{supplier.business_id}:{supplier.category}:{supplier.distributor_name}"
+        row['fingerprint'] = item_fingerprint(supplier_id, row['item_name'], row['item_type'], row['size'],
+                                              row['uom'], row['additional_info'])
+
+    fingerprints = list({row['fingerprint'] for row in rows})
+    existing = {}
+    for start in range(0, len(fingerprints), BATCH_SIZE):
+        for item in ItemDetails.objects.filter(fingerprint__in=fingerprints[start:start + BATCH_SIZE]):
+            existing[item.fingerprint] = item
+    return existing
+
+
+def upsert_items(rows):
+    # Must run inside an atomic block. Matches rows to existing items by their
+    # fingerprint, then writes all changes with bulk_create/bulk_update.
+    existing = match_items(rows)
+
+    to_create = {}
+    to_update = {}
+    added_rows = 0
+    updated_rows = 0
+
+    for row in rows:
+        key = row['fingerprint']
+        item = existing.get(key) or to_create.get(key)
+
+        if item is not None:
+            item.quantity = row['quantity']
+            item.price = row['price']
+            item.cogs = row['cogs']
+            item.alert_quantity = row['alert_quantity']
+            item.imported_date = row['imported_date']
+            if item.pk is not None:
+                to_update[item.pk] = item
+            updated_rows += 1
+        else:
+            # bulk_create skips save(), so the fingerprint is set here.
+            to_create[key] = ItemDetails(supplier=row['supplier'], item_name=row['item_name'], item_type=row['item_type'],
+                                         size=row['size'], unit_of_measurement=row['uom'], quantity=row['quantity'],
+                                         price=row['price'], cogs=row['cogs'], alert_quantity=row['alert_quantity'],
+                                         additional_info=row['additional_info'], imported_date=row['imported_date'],
+                                         fingerprint=key)
+            added_rows += 1
+
+    ItemDetails.objects.bulk_create(to_create.values(), batch_size=BATCH_SIZE)
+    ItemDetails.objects.bulk_update(to_update.values(), UPDATE_FIELDS, batch_size=BATCH_SIZE)
+
+    business_ids = {row['supplier'].business_id for row in rows}
+    for business_id in business_ids:
+        invalidate(business_id)
+
+    return added_rows, updated_rows
+
+
+def money(value):
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def item_values(row):
+    return {
+        'quantity': int(row['quantity']),
+        'price': money(row['price']),
+        'cogs': money(row['cogs']),
+        'alert_quantity': int(row['alert_quantity']),
+        # upsert_items writes it on every matched item, so it counts as a change.
+        'imported_date': row['imported_date'],
+    }
+
+
+def diff_items(rows):
+    # Dry run of upsert_items: the same lookup, but nothing is written. Later
+    # rows for the same item win, as they do in a real import.
+    rows = list(rows)
+    existing = match_items(rows, create_suppliers=False)
+    final = {row['fingerprint']: row for row in rows}
+
+    added = []
+    updated = []
+    untouched = []
+    for key, row in final.items():
+        entry = {
+            'business': row['business_name'],
+            'category': row['category'],
+            'distributor_name': row['distributor_name'],
+            'item_name': row['item_name'],
+            'item_type': row['item_type'],
+            'size': float(row['size']),
+            'uom': row['uom'],
+            'additional_info': row['additional_info'],
+        }
+        new = item_values(row)
+        item = existing.get(key)
+        if item is None:
+            added.append({**entry, **new})
+            continue
+
+        old = {field: getattr(item, field) for field in new}
+        if old == new:
+            untouched.append({'item_id': item.id, **entry})
+        else:
+            updated.append({'item_id': item.id, **entry, 'old': old, 'new': new})
+
+    return {'added': added, 'updated': updated, 'untouched': untouched}
+
+
+def import_items(rows):
+    rows = list(rows)
+    with transaction.atomic():
+        return upsert_items(rows)
+
+
+def import_items_in_chunks(rows, chunk_size=CHUNK_SIZE):
+    # Same upsert as import_items, but only chunk_size rows are materialised at
+    # a time; the whole import still commits or rolls back as one.
+    rows = iter(rows)
+    added_rows = 0
+    updated_rows = 0
+    with transaction.atomic():
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            added, updated = upsert_items(chunk)
+            added_rows += added
+            updated_rows += updated
+    return added_rows, updated_rows
@@ -0,0 +1,101 @@
+import os
+import socket
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from Inventory_Management.models import ImportJob
+from Inventory_Management.imports import CHUNK_SIZE, column_mapping, read_rows, upsert_items
+
+MAX_WORKERS = 2
+LEASE = timedelta(minutes=2)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='import-job')
+        return _executor
+
+
+def submit_import_job(job_id):
+    # Deferred until the job row is committed, otherwise the worker may not see it.
+    transaction.on_commit(lambda: executor().submit(run_in_thread, job_id))
+
+
+def run_in_thread(job_id):
+    try:
+        run_import_job(job_id)
+    finally:
+        connection.close()
+
+
+def claim(job_id):
+    # A job is free when nobody holds it, or its holder stopped sending
+    # heartbeats (the process died); only one worker wins the update.
+    now = timezone.now()
+    return ImportJob.objects.filter(
+        Q(locked_by='') | Q(heartbeat_at__lt=now - LEASE),
+        pk=job_id, status__in=['queued', 'running'],
+    ).update(locked_by=WORKER_ID, heartbeat_at=now) == 1
+
+
+def is_stale(job):
+    # Held by a worker that stopped sending heartbeats. A queued job nobody
+    # has claimed yet is still waiting for a free worker, not stale.
+    return (
+        job.status in ('queued', 'running')
+        and bool(job.locked_by)
+        and (job.heartbeat_at is None or job.heartbeat_at < timezone.now() - LEASE)
+    )
+
+
+def run_import_job(job_id, chunk_size=CHUNK_SIZE):
+    if not claim(job_id):
+        return
+
+    job = ImportJob.objects.get(pk=job_id)
+    if job.started_at is None:
+        job.started_at = timezone.now()
+    job.status = 'running'
+    job.save(update_fields=['status', 'started_at'])
+
+    try:
+        # Rows from chunks committed before a restart are skipped, not re-applied.
+        rows = islice(read_rows(job.file.path, job.file_format, column_mapping(job.column_mapping)), job.rows_processed, None)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            # Progress is committed together with the chunk, so it always
+            # matches what is in the database.
+            with transaction.atomic():
+                added, updated = upsert_items(chunk)
+                ImportJob.objects.filter(pk=job_id).update(
+                    rows_processed=F('rows_processed') + len(chunk),
+                    added_rows=F('added_rows') + added,
+                    updated_rows=F('updated_rows') + updated,
+                    heartbeat_at=timezone.now(),
+                )
+    except Exception as e:
+        job.refresh_from_db()
+        job.errors = job.errors + [f"Row {job.rows_processed + 2} onwards: {e}"]
+        job.status = 'failed'
+    else:
+        job.refresh_from_db()
+        job.status = 'completed'
+
+    job.finished_at = timezone.now()
+    job.locked_by = ''
+    job.save(update_fields=['status', 'errors', 'finished_at', 'locked_by'])
@@ -0,0 +1,65 @@
+import time
+import statistics
+from uuid import uuid4
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from Inventory_Management.models import CustomUser, Business, Supplier, ItemDetails, UpiDetails
+from Inventory_Management.views import CartItemListCreateAPIView, CartCheckoutAPIView
+
+
+class Command(BaseCommand):
+    help = ('Time /cart/checkout/ for carts of different sizes. Run it against a scratch database: everything it '
+            'creates is rolled back, but its rows are locked for the whole run.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='+', default=[1, 10, 100])
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--scratch', action='store_true',
+                            help='Confirm that the configured database is a scratch copy. Not needed with DEBUG on.')
+
+    def handle(self, *args, **options):
+        if not (settings.DEBUG or options['scratch']):
+            raise CommandError('Refusing to benchmark against what may be a production database. '
+                               'Point the settings at a scratch copy and pass --scratch.')
+
+        name = f"checkout-benchmark-{uuid4().hex[:12]}"
+        factory = APIRequestFactory()
+        add_to_cart = CartItemListCreateAPIView.as_view()
+        checkout = CartCheckoutAPIView.as_view()
+
+        with transaction.atomic():
+            user = CustomUser.objects.create_user(username=name, email=f'{name}@example.com', password='unused')
+            business = Business.objects.create(owner=user, business_name=name, business_address='-',
+                                               business_city='-', business_state='-', business_country='-')
+            supplier = Supplier.objects.create(business=business, category='Benchmark', distributor_name='Benchmark')
+            UpiDetails.objects.create(user=user, payee_vpa='benchmark@upi', payee_name='Benchmark')
+            items = ItemDetails.objects.bulk_create([
+                ItemDetails(supplier=supplier, item_name=f'Item {index}', item_type='Packet', size=1, unit_of_measurement='kg',
+                            quantity=10 ** 6, price=Decimal('10.50'), cogs=Decimal('7.25'), fingerprint=f'{name}-{index}')
+                for index in range(max(options['lines']))
+            ])
+
+            for lines in options['lines']:
+                timings = []
+                for _ in range(options['runs']):
+                    for item in items[:lines]:
+                        request = factory.post('/inventory/cart/', {'item_id': item.id, 'quantity': 1}, format='json')
+                        force_authenticate(request, user)
+                        add_to_cart(request)
+
+                    request = factory.post('/inventory/cart/checkout/', format='json')
+                    force_authenticate(request, user)
+                    start = time.perf_counter()
+                    response = checkout(request)
+                    timings.append(time.perf_counter() - start)
+                    if response.status_code != 200:
+                        raise RuntimeError(response.data)
+                self.stdout.write(f"{lines:>4} lines: median {statistics.median(timings) * 1000:.1f} ms, "
+                                  f"max {max(timings) * 1000:.1f} ms over {options['runs']} runs")
+
+            transaction.set_rollback(True)
@@ -0,0 +1,71 @@
+import os
+import json
+import time
+import resource
+import tempfile
+import multiprocessing
+from datetime import datetime
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+COLUMNS = ['Business', 'Category', 'Distributor Name', 'Item Name', 'Item Type', 'Size', 'Uom', 'Quantity',
+           'Price', 'COGS', 'Alert', 'Additional Info', 'Date']
+
+
+def generate_workbook(path, rows):
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Data')
+    sheet.append(COLUMNS)
+    imported_date = datetime(2023, 5, 1)
+    for index in range(rows):
+        sheet.append(['Shop', f'Category {index % 50}', f'Distributor {index % 20}', f'Item {index}', 'Packet',
+                      index % 10 + 1, 'kg', index % 500, 10.5, 7.25, 5, json.dumps({'batch': index % 7}), imported_date])
+    workbook.save(path)
+
+
+def parse(mode, path, chunk_size, results):
+    # Runs in a fresh process so ru_maxrss reflects only this reader.
+    import django
+    django.setup()
+    import pandas as pd
+    from Inventory_Management.imports import parse_excel_rows, read_excel_rows
+
+    start = time.perf_counter()
+    rows = 0
+    if mode == 'pandas':
+        df = pd.read_excel(path, sheet_name='Data')
+        rows = len(list(parse_excel_rows(df)))
+    else:
+        stream = read_excel_rows(path)
+        while True:
+            chunk = list(islice(stream, chunk_size))
+            if not chunk:
+                break
+            rows += len(chunk)
+    results.put((mode, rows, time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+class Command(BaseCommand):
+    help = 'Compare peak memory and wall time of the pandas and streaming Excel import readers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.xlsx')
+            self.stdout.write(f"Generating {options['rows']} rows...")
+            generate_workbook(path, options['rows'])
+
+            context = multiprocessing.get_context('spawn')
+            results = context.Queue()
+            for mode in ('pandas', 'stream'):
+                process = context.Process(target=parse, args=(mode, path, options['chunk_size'], results))
+                process.start()
+                mode, rows, seconds, max_rss = results.get()
+                process.join()
+                self.stdout.write(f"{mode:>6}: {rows} rows in {seconds:.1f}s, peak RSS {max_rss / 1024:.0f} MiB")
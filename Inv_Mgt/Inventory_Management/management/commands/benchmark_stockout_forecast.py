@@ -0,0 +1,72 @@
+import time
+from uuid import uuid4
+from decimal import Decimal
+from datetime import timedelta
+
+import numpy
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.core.management.base import BaseCommand, CommandError
+
+from Inventory_Management.models import CustomUser, Business, Supplier, ItemDetails, DailyItemSales
+from Inventory_Management.forecasting import HISTORY_DAYS, load_sales_matrix, forecast_matrix, compute_forecast
+
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = ('Time the stock-out forecast end to end (loading the rollup, the forecast and building the response) '
+            'on generated sales. Run it against a scratch database: everything it creates is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=50000)
+        parser.add_argument('--density', type=float, default=0.1, help='Share of item-days with sales.')
+        parser.add_argument('--scratch', action='store_true',
+                            help='Confirm that the configured database is a scratch copy. Not needed with DEBUG on.')
+
+    def handle(self, *args, **options):
+        if not (settings.DEBUG or options['scratch']):
+            raise CommandError('Refusing to benchmark against what may be a production database. '
+                               'Point the settings at a scratch copy and pass --scratch.')
+
+        name = f"forecast-benchmark-{uuid4().hex[:12]}"
+        end_day = timezone.localdate() - timedelta(days=1)
+        with transaction.atomic():
+            user = CustomUser.objects.create_user(username=name, email=f'{name}@example.com', password='unused')
+            business = Business.objects.create(owner=user, business_name=name, business_address='-',
+                                               business_city='-', business_state='-', business_country='-')
+            supplier = Supplier.objects.create(business=business, category='Benchmark', distributor_name='Benchmark')
+            items = ItemDetails.objects.bulk_create([
+                ItemDetails(supplier=supplier, item_name=f'Item {index}', item_type='Packet', size=1, unit_of_measurement='kg',
+                            quantity=index % 500, price=Decimal('10.50'), cogs=Decimal('7.25'), fingerprint=f'{name}-{index}')
+                for index in range(options['items'])
+            ], batch_size=BATCH_SIZE)
+
+            self.stdout.write(f"Generating sales for {len(items)} items x {HISTORY_DAYS} days...")
+            generator = numpy.random.default_rng(0)
+            item_index, day_index = numpy.nonzero(generator.random((len(items), HISTORY_DAYS), dtype=numpy.float32) < options['density'])
+            units = generator.integers(1, 20, size=len(item_index))
+            rows = (
+                DailyItemSales(business=business, item_id=items[i].id, day=end_day - timedelta(days=int(d)), units=int(u))
+                for i, d, u in zip(item_index, day_index, units)
+            )
+            while True:
+                batch = [row for _, row in zip(range(BATCH_SIZE), rows)]
+                if not batch:
+                    break
+                DailyItemSales.objects.bulk_create(batch)
+
+            start = time.perf_counter()
+            loaded_items, matrix = load_sales_matrix(business, end_day)
+            loaded = time.perf_counter()
+            forecast_matrix(matrix, [item[2] for item in loaded_items])
+            forecasted = time.perf_counter()
+            forecast = compute_forecast(business, end_day)
+            total = time.perf_counter() - forecasted
+
+            self.stdout.write(f"{len(item_index)} sales rows: load {(loaded - start) * 1000:.0f} ms, "
+                              f"forecast {(forecasted - loaded) * 1000:.0f} ms, "
+                              f"end to end {total * 1000:.0f} ms for {len(forecast)} items")
+
+            transaction.set_rollback(True)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Inventory_Management.models import Business
+from Inventory_Management.exports import write_snapshot, CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Export the suppliers, items and transactions of a business as Parquet files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('business', help='Name of the business to export.')
+        parser.add_argument('output', help='Directory the snapshot is written to.')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only append transactions newer than the last snapshot.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            business = Business.objects.get(business_name=options['business'])
+        except Business.DoesNotExist:
+            raise CommandError(f"Business {options['business']} does not exist.")
+
+        written = write_snapshot(business, options['output'], incremental=options['incremental'],
+                                 chunk_size=options['chunk_size'])
+        for table, rows in written.items():
+            self.stdout.write(f"{table}: {rows} rows")
+        self.stdout.write(self.style.SUCCESS(f"Snapshot of {business.business_name} written to {options['output']}."))
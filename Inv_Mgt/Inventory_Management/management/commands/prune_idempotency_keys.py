@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Inventory_Management.idempotency import PRUNE_BATCH_SIZE, prune_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = 'Delete idempotency keys older than IDEMPOTENCY_KEY_TTL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PRUNE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        pruned = prune_idempotency_keys(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} idempotency keys."))
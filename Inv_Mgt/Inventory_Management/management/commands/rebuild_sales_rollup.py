@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Inventory_Management.models import Business
+from Inventory_Management.analytics import rebuild_sales_rollup
+from Inventory_Management.caching import bump_data_version
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily item sales rollup from the transaction history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', help='Only rebuild the rollup of the business with this name.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        business = None
+        if options['business']:
+            try:
+                business = Business.objects.get(business_name=options['business'])
+            except Business.DoesNotExist:
+                raise CommandError(f"Business {options['business']} does not exist.")
+
+        created = rebuild_sales_rollup(business, batch_size=options['batch_size'])
+        bump_data_version(business.id if business else None)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} daily item sales rows."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from Inventory_Management.models import ImportJob
+from Inventory_Management.jobs import is_stale, run_import_job
+
+
+class Command(BaseCommand):
+    help = 'Finish background import jobs left unfinished by a restarted worker, from their last committed chunk.'
+
+    def handle(self, *args, **options):
+        # Queued jobs nobody claimed were waiting in the executor of the
+        # restarted process and are lost with it; claim() still keeps a live
+        # worker and this command from running the same job twice.
+        jobs = [job for job in ImportJob.objects.filter(status__in=['queued', 'running']).order_by('id')
+                if is_stale(job) or not job.locked_by]
+        for job in jobs:
+            self.stdout.write(f"Resuming import job {job.id} from row {job.rows_processed}...")
+            run_import_job(job.id)
+            job.refresh_from_db()
+            self.stdout.write(f"Import job {job.id} {job.status}: {job.rows_processed} rows processed.")
+        self.stdout.write(self.style.SUCCESS(f"Resumed {len(jobs)} import jobs."))
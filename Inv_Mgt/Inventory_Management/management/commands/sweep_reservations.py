@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Inventory_Management.reservations import SWEEP_BATCH_SIZE, sweep_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Delete expired stock reservations and fail the cart sales they belonged to.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        swept = sweep_expired_reservations(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Swept {swept} expired reservations."))
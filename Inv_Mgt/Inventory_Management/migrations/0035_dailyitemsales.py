@@ -0,0 +1,124 @@
+# Generated by Django 4.1.5 on 2026-10-18 19:05
+
+from decimal import Decimal
+from django.db import migrations, models, transaction
+from django.db.models import Max, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def backfill_daily_item_sales(apps, schema_editor):
+    # Frozen copy of analytics.rebuild_sales_rollup, run over a range of item
+    # ids at a time so each batch commits on its own.
+    ItemDetails = apps.get_model("Inventory_Management", "ItemDetails")
+    Transaction = apps.get_model("Inventory_Management", "Transaction")
+    DailyItemSales = apps.get_model("Inventory_Management", "DailyItemSales")
+    using = schema_editor.connection.alias
+
+    max_pk = ItemDetails.objects.using(using).aggregate(Max("pk"))["pk__max"] or 0
+    last_pk = 0
+    while last_pk < max_pk:
+        with transaction.atomic(using=using):
+            item_info = {
+                item_id: (cogs, business_id)
+                for item_id, cogs, business_id in ItemDetails.objects.using(using)
+                .filter(pk__gt=last_pk, pk__lte=last_pk + BATCH_SIZE)
+                .values_list("id", "cogs", "supplier__business_id")
+            }
+            per_day = (
+                Transaction.objects.using(using)
+                .filter(status="success", type="sold", item_id__gt=last_pk, item_id__lte=last_pk + BATCH_SIZE)
+                .annotate(day=TruncDate("created_at"))
+                .values("item_id", "day")
+                .annotate(units=Sum("unit"), revenue=Sum("amount"))
+                .order_by()
+            )
+            DailyItemSales.objects.using(using).bulk_create(
+                [
+                    DailyItemSales(
+                        business_id=item_info[row["item_id"]][1],
+                        item_id=row["item_id"],
+                        day=row["day"],
+                        units=row["units"],
+                        revenue=row["revenue"],
+                        cogs=item_info[row["item_id"]][0] * row["units"],
+                    )
+                    for row in per_day
+                    # Sales of deleted items are not counted, as in the rebuild.
+                    if row["item_id"] in item_info
+                ],
+                batch_size=BATCH_SIZE,
+            )
+        last_pk += BATCH_SIZE
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("Inventory_Management", "0034_transaction_transaction_made_by"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyItemSales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("units", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14
+                    ),
+                ),
+                (
+                    "cogs",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14
+                    ),
+                ),
+                (
+                    "business",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="Inventory_Management.business",
+                    ),
+                ),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="Inventory_Management.itemdetails",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="dailyitemsales",
+            index=models.Index(
+                fields=["business", "day"], name="daily_sales_business_day"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dailyitemsales",
+            index=models.Index(fields=["item", "day"], name="daily_sales_item_day"),
+        ),
+        migrations.AddConstraint(
+            model_name="dailyitemsales",
+            constraint=models.UniqueConstraint(
+                fields=("business", "item", "day"), name="unique_daily_item_sales"
+            ),
+        ),
+        migrations.RunPython(backfill_daily_item_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("Inventory_Management", "0035_dailyitemsales"),
+    ]
+
+    operations = [
+        # Only drops NOT NULL; orphaned ids are cleared by the backfill in 0037.
+        migrations.AlterField(
+            model_name="transaction",
+            name="item_id",
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="business",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="Inventory_Management.business",
+            ),
+        ),
+        # The "item_id" column is kept as is and becomes the column of the new
+        # "item" foreign key. The constraint is added in 0038, after the backfill.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name="transaction",
+                    name="item_id",
+                ),
+                migrations.AddField(
+                    model_name="transaction",
+                    name="item",
+                    field=models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="transactions",
+                        to="Inventory_Management.itemdetails",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, transaction
+from django.db.models import Max, OuterRef, Subquery
+
+BATCH_SIZE = 10000
+
+
+def backfill_transactions(apps, schema_editor):
+    # Walks the table in primary key ranges, each committed on its own, so no
+    # lock is held for longer than one batch.
+    Transaction = apps.get_model("Inventory_Management", "Transaction")
+    ItemDetails = apps.get_model("Inventory_Management", "ItemDetails")
+    using = schema_editor.connection.alias
+
+    item_business = ItemDetails.objects.using(using).filter(pk=OuterRef("item_id")).values("supplier__business")[:1]
+    max_pk = Transaction.objects.using(using).aggregate(Max("pk"))["pk__max"] or 0
+    last_pk = 0
+    while last_pk < max_pk:
+        with transaction.atomic(using=using):
+            batch = Transaction.objects.using(using).filter(pk__gt=last_pk, pk__lte=last_pk + BATCH_SIZE)
+            batch.filter(item__isnull=False).exclude(
+                item_id__in=ItemDetails.objects.using(using).values("id")
+            ).update(item=None)
+            batch.filter(business__isnull=True, item__isnull=False).update(business=Subquery(item_business))
+        last_pk += BATCH_SIZE
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("Inventory_Management", "0036_transaction_item_business"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_transactions, migrations.RunPython.noop),
+    ]
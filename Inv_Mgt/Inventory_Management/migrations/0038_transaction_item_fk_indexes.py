@@ -0,0 +1,72 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class AddForeignKeyConstraint(migrations.AlterField):
+    # On PostgreSQL the constraint is added NOT VALID and validated afterwards,
+    # which does not block writes to the table while existing rows are checked.
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        field = model._meta.get_field(self.name)
+        fk_sql = schema_editor._create_fk_sql(model, field, "_fk_%(to_table)s_%(to_column)s")
+        schema_editor.execute(f"{fk_sql} NOT VALID")
+        schema_editor.execute(
+            f"ALTER TABLE {schema_editor.quote_name(model._meta.db_table)} VALIDATE CONSTRAINT {fk_sql.parts['name']}"
+        )
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    # CREATE INDEX CONCURRENTLY on PostgreSQL, a plain index elsewhere.
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            if schema_editor.connection.vendor == "postgresql":
+                schema_editor.add_index(model, self.index, concurrently=True)
+            else:
+                schema_editor.add_index(model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            if schema_editor.connection.vendor == "postgresql":
+                schema_editor.remove_index(model, self.index, concurrently=True)
+            else:
+                schema_editor.remove_index(model, self.index)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("Inventory_Management", "0037_backfill_transaction_business"),
+    ]
+
+    operations = [
+        AddForeignKeyConstraint(
+            model_name="transaction",
+            name="item",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="transactions",
+                to="Inventory_Management.itemdetails",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(
+                fields=["business", "status", "type", "created_at"],
+                name="txn_business_status_type_at",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="transaction",
+            index=models.Index(
+                fields=["item", "status", "created_at"],
+                name="txn_item_status_created_at",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.5 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Inventory_Management", "0039_importjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importjob",
+            name="column_mapping",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="importjob",
+            name="file_format",
+            field=models.CharField(default="xlsx", max_length=10),
+        ),
+    ]
@@ -0,0 +1,59 @@
+import json
+from hashlib import sha256
+
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 5000
+
+
+def item_fingerprint(supplier_id, item_name, item_type, size, unit_of_measurement, additional_info):
+    # Frozen copy of models.item_fingerprint.
+    identity = [supplier_id, item_name, item_type, float(size), unit_of_measurement, additional_info or {}]
+    return sha256(json.dumps(identity, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def backfill_fingerprints(apps, schema_editor):
+    ItemDetails = apps.get_model("Inventory_Management", "ItemDetails")
+    using = schema_editor.connection.alias
+
+    last_pk = 0
+    while True:
+        with transaction.atomic(using=using):
+            items = list(ItemDetails.objects.using(using).filter(pk__gt=last_pk).order_by("pk")[:BATCH_SIZE])
+            if not items:
+                break
+            for item in items:
+                item.fingerprint = item_fingerprint(
+                    item.supplier_id,
+                    item.item_name,
+                    item.item_type,
+                    item.size,
+                    item.unit_of_measurement,
+                    item.additional_info,
+                )
+            ItemDetails.objects.using(using).bulk_update(items, ["fingerprint"])
+        last_pk = items[-1].pk
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("Inventory_Management", "0040_importjob_file_format_column_mapping"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="itemdetails",
+            name="fingerprint",
+            field=models.CharField(default="", editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+        # Indexed after the backfill, so the index is built once instead of
+        # being updated row by row.
+        migrations.AlterField(
+            model_name="itemdetails",
+            name="fingerprint",
+            field=models.CharField(db_index=True, default="", editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+INDEX_NAME = "item_additional_info_gin"
+
+
+def create_gin_index(apps, schema_editor):
+    # jsonb_path_ops only serves @> (containment), which is all variant
+    # matching needs, and is much smaller than the default GIN operator class.
+    # Other backends have no GIN indexes and fall back to key lookups.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    ItemDetails = apps.get_model("Inventory_Management", "ItemDetails")
+    schema_editor.execute(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} ON {schema_editor.quote_name(ItemDetails._meta.db_table)} "
+        f"USING gin (additional_info jsonb_path_ops)"
+    )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("Inventory_Management", "0041_itemdetails_fingerprint"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
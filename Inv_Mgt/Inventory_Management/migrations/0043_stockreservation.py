@@ -0,0 +1,58 @@
+# Generated by Django 4.1.5 on 2026-10-18 19:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Inventory_Management", "0042_itemdetails_additional_info_gin"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockReservation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("quantity", models.PositiveIntegerField()),
+                ("expires_at", models.DateTimeField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "item",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reservations",
+                        to="Inventory_Management.itemdetails",
+                    ),
+                ),
+                (
+                    "transaction",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reservation",
+                        to="Inventory_Management.transaction",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="stockreservation",
+            index=models.Index(
+                fields=["item", "expires_at"], name="reservation_item_expires_at"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stockreservation",
+            index=models.Index(fields=["expires_at"], name="reservation_expires_at"),
+        ),
+    ]
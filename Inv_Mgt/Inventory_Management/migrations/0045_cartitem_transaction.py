@@ -0,0 +1,48 @@
+# Generated by Django 4.1.5 on 2026-10-18 19:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_cart_items(apps, schema_editor):
+    # Best effort: each existing cart line gets the newest pending sale of its
+    # item made by the cart's owner that no other line has claimed.
+    CartItem = apps.get_model("Inventory_Management", "CartItem")
+    Transaction = apps.get_model("Inventory_Management", "Transaction")
+    using = schema_editor.connection.alias
+
+    claimed = set()
+    for cart_item in CartItem.objects.using(using).select_related("cart").order_by("-id").iterator():
+        pending = (
+            Transaction.objects.using(using)
+            .filter(item_id=cart_item.item_id, transaction_made_by_id=cart_item.cart.user_id, status="pending", type="sold")
+            .exclude(pk__in=claimed)
+            .order_by("-id")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if pending is not None:
+            claimed.add(pending)
+            CartItem.objects.using(using).filter(pk=cart_item.pk).update(transaction_id=pending)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Inventory_Management", "0044_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cartitem",
+            name="transaction",
+            field=models.OneToOneField(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="cart_item",
+                to="Inventory_Management.transaction",
+            ),
+        ),
+        migrations.RunPython(link_cart_items, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,9 @@
+import json
 import random
-from django.db import models
+from hashlib import sha256
+from django.db import models, connections
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.fields.json import KeyTransform
 from decimal import Decimal
 from phone_field import PhoneField
 from django.contrib.auth.models import AbstractUser
@@ -86,6 +90,28 @@ class Supplier(models.Model):
     def __str__(self):
         return self.business.business_name + "-" + self.category + "-" + self.distributor_name
 
+def item_fingerprint(supplier_id, item_name, item_type, size, unit_of_measurement, additional_info):
+    # Identity of an item variant. additional_info is hashed as canonical JSON,
+    # so key order does not matter and a missing value equals {}.
+    identity = [supplier_id, item_name, item_type, float(size), unit_of_measurement, additional_info or {}]
+    return sha256(json.dumps(identity, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def matching_variants(items, additional_info):
+    # Items whose additional_info contains every key/value in additional_info.
+    # PostgreSQL answers this with @> from the GIN index; backends without JSON
+    # containment compare the keys one by one in SQL instead.
+    if not additional_info:
+        return items
+    if connections[items.db].features.supports_json_field_contains:
+        return items.filter(additional_info__contains=additional_info)
+    for index, (key, value) in enumerate(additional_info.items()):
+        # An alias rather than additional_info__<key>, so keys containing "__" work.
+        alias = f'additional_info_{index}'
+        items = items.alias(**{alias: KeyTransform(key, 'additional_info')}).filter(**{alias: value})
+    return items
+
+
 class ItemDetails(models.Model):
     supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE)
     item_name = models.CharField(max_length=255)
@@ -99,6 +125,18 @@ class ItemDetails(models.Model):
     additional_info = models.JSONField(blank=True, null=True)
     imported_date = models.DateField(null=True, blank=True)
     created_at = models.DateField(auto_now_add=True)
+    fingerprint = models.CharField(max_length=64, db_index=True, editable=False, default='')
+
+    def save(self, *args, **kwargs):
+        self.fingerprint = self.compute_fingerprint()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'fingerprint' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['fingerprint']
+        super().save(*args, **kwargs)
+
+    def compute_fingerprint(self):
+        return item_fingerprint(self.supplier_id, self.item_name, self.item_type, self.size, self.unit_of_measurement,
+                                self.additional_info)
 
     def __str__(self):
         return self.supplier.category + "-" + self.supplier.distributor_name + "-" + self.item_name
@@ -129,7 +167,8 @@ class Transaction(models.Model):
     transaction_id = models.CharField(max_length=255, unique=True)
     transaction_ref_id = models.CharField(max_length=255, blank=True, null=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
-    item_id = models.IntegerField(default=0)
+    item = models.ForeignKey(ItemDetails, related_name='transactions', on_delete=models.SET_NULL, null=True, db_index=False)
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, null=True, db_index=False)
     unit = models.IntegerField(default=0)
     status = models.CharField(max_length=20, choices=TRANSACTION_STATUS_CHOICES, default='pending')
     type = models.CharField(max_length=20, choices=TRANSACTION_TYPE, default='sold')
@@ -137,10 +176,107 @@ class Transaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['business', 'status', 'type', 'created_at'], name='txn_business_status_type_at'),
+            models.Index(fields=['item', 'status', 'created_at'], name='txn_item_status_created_at'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.business_id is None and self.item_id is not None:
+            self.business_id = ItemDetails.objects.filter(pk=self.item_id).values_list('supplier__business_id', flat=True).first()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.upi_details.user.username} - {self.transaction_id} - {self.status}"
 
 
+class DailyItemSales(models.Model):
+    business = models.ForeignKey(Business, on_delete=models.CASCADE)
+    item = models.ForeignKey(ItemDetails, on_delete=models.CASCADE)
+    day = models.DateField()
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    cogs = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['business', 'item', 'day'], name='unique_daily_item_sales')
+        ]
+        indexes = [
+            models.Index(fields=['business', 'day'], name='daily_sales_business_day'),
+            models.Index(fields=['item', 'day'], name='daily_sales_item_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.item.item_name} - {self.day} - {self.units}"
+
+
+class StockReservation(models.Model):
+    # Stock held for a pending cart sale until the payment is resolved or the
+    # reservation expires.
+    item = models.ForeignKey(ItemDetails, related_name='reservations', on_delete=models.CASCADE, db_index=False)
+    transaction = models.OneToOneField(Transaction, related_name='reservation', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['item', 'expires_at'], name='reservation_item_expires_at'),
+            models.Index(fields=['expires_at'], name='reservation_expires_at'),
+        ]
+
+    def __str__(self):
+        return f"{self.item.item_name} - {self.quantity} until {self.expires_at}"
+
+
+class IdempotencyKey(models.Model):
+    # The stored outcome of a write request sent with an Idempotency-Key
+    # header. status_code stays null while the first request is running.
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key')
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.key}"
+
+
+class ImportJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    file = models.FileField(upload_to='imports/')
+    file_format = models.CharField(max_length=10, default='xlsx')
+    column_mapping = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    rows_processed = models.IntegerField(default=0)
+    added_rows = models.IntegerField(default=0)
+    updated_rows = models.IntegerField(default=0)
+    errors = models.JSONField(default=list)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.file.name} - {self.status}"
+
+
 class Cart(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE)
 
@@ -152,6 +288,7 @@ class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, default=0)
     item = models.ForeignKey(ItemDetails, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=0)
+    transaction = models.OneToOneField(Transaction, related_name='cart_item', on_delete=models.SET_NULL, null=True, blank=True)
 
     def __str__(self):
         return f"{self.item.item_name} - {self.quantity}"
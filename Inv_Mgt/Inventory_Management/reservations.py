@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Sum, OuterRef, Subquery, Value, IntegerField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from Inventory_Management.models import ItemDetails, Transaction, StockReservation
+
+SWEEP_BATCH_SIZE = 5000
+
+
+def reservation_ttl():
+    return timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', 15 * 60))
+
+
+def active_reservations():
+    return StockReservation.objects.filter(expires_at__gt=timezone.now())
+
+
+def reserved_quantities(item_ids):
+    # One aggregate over the (item, expires_at) index.
+    return dict(
+        active_reservations().filter(item_id__in=item_ids).values('item_id').annotate(total=Sum('quantity'))
+        .values_list('item_id', 'total').order_by()
+    )
+
+
+def reserved_subquery():
+    # Reserved units of one item, for use inside a filter or update on ItemDetails.
+    reserved = active_reservations().filter(item_id=OuterRef('pk')).values('item_id').annotate(total=Sum('quantity')).values('total')
+    return Coalesce(Subquery(reserved), Value(0), output_field=IntegerField())
+
+
+def available_quantity(item):
+    return item.quantity - reserved_quantities([item.id]).get(item.id, 0)
+
+
+def reserve(item, transaction, quantity):
+    # Holds quantity of item for transaction. Returns the reservation, or None
+    # if less than quantity is available. Call inside an atomic block.
+    locked = ItemDetails.objects.select_for_update().filter(pk=item.pk).values_list('quantity', flat=True).get()
+    if locked - reserved_quantities([item.id]).get(item.id, 0) < quantity:
+        return None
+    return StockReservation.objects.create(item=item, transaction=transaction, quantity=quantity,
+                                           expires_at=timezone.now() + reservation_ttl())
+
+
+def resize(reservation, quantity):
+    # Changes how much reservation holds. Returns False, leaving it as it is,
+    # if quantity is more than is available. Call inside an atomic block.
+    locked = ItemDetails.objects.select_for_update().filter(pk=reservation.item_id).values_list('quantity', flat=True).get()
+    others = active_reservations().filter(item_id=reservation.item_id).exclude(pk=reservation.pk).aggregate(total=Sum('quantity'))['total']
+    if locked - (others or 0) < quantity:
+        return False
+    StockReservation.objects.filter(pk=reservation.pk).update(quantity=quantity)
+    reservation.quantity = quantity
+    return True
+
+
+def sweep_expired_reservations(batch_size=SWEEP_BATCH_SIZE):
+    # Expired reservations are deleted a batch of primary keys at a time, so
+    # no single statement locks a large part of the table. Their sales were
+    # abandoned, so pending transactions are failed without a restock: the
+    # stock was only reserved, never taken, and a late confirmation takes it
+    # like any other failed sale being confirmed. The batch is locked, so a
+    # reservation released by a checkout meanwhile is skipped along with its
+    # sale, whose stock the checkout did take.
+    swept = 0
+    while True:
+        with db_transaction.atomic():
+            batch = list(
+                StockReservation.objects.select_for_update().filter(expires_at__lte=timezone.now()).order_by('expires_at')
+                .values_list('pk', 'transaction_id')[:batch_size]
+            )
+            if not batch:
+                return swept
+            Transaction.objects.filter(pk__in=[transaction_id for pk, transaction_id in batch], status='pending') \
+                .update(status='failed', updated_at=timezone.now())
+            StockReservation.objects.filter(pk__in=[pk for pk, transaction_id in batch]).delete()
+        swept += len(batch)
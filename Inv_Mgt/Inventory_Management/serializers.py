@@ -4,7 +4,8 @@ from datetime import date
 import math
 
 from Inventory_Management.models import CustomUser, PasswordResetRequest, Business, Supplier, ItemDetails, UpiDetails, Transaction, CartItem, \
-BusinessWorker
+BusinessWorker, DailyItemSales
+from Inventory_Management.reservations import reserved_quantities
 
 
 class CustomUserSerializer(serializers.ModelSerializer):
@@ -62,15 +63,27 @@ class ItemDetailsSerializer(serializers.ModelSerializer):
 class ItemDetailsSearchSerializer(serializers.ModelSerializer):
     supplier = SupplierSerializer()
     daystostockout = serializers.SerializerMethodField()
+    available_quantity = serializers.SerializerMethodField()
 
     class Meta:
         model = ItemDetails
-        fields = ['id', 'item_name', 'item_type', 'size', 'unit_of_measurement', 'quantity', 'price', 'cogs', 'additional_info', 'daystostockout', 'alert_quantity', 'supplier']
+        fields = ['id', 'item_name', 'item_type', 'size', 'unit_of_measurement', 'quantity', 'available_quantity', 'price', 'cogs', 'additional_info', 'daystostockout', 'alert_quantity', 'supplier']
+
+    def get_available_quantity(self, obj):
+        # On-hand stock less what pending cart sales have reserved.
+        reserved = self.context.get('reserved_quantities')
+        if reserved is None:
+            reserved = reserved_quantities([obj.id])
+        return obj.quantity - reserved.get(obj.id, 0)
 
     def get_daystostockout(self, obj):
-        today = date.today()
-        transactions_today = Transaction.objects.filter(item_id=obj.id, created_at__date=today, status='success')
-        total_units_sold = sum(transaction.unit for transaction in transactions_today)
+        # Views serializing many items pass the day's sales for all of them in the context.
+        units_sold_today = self.context.get('units_sold_today')
+        if units_sold_today is not None:
+            total_units_sold = units_sold_today.get(obj.id, 0)
+        else:
+            today = timezone.localdate()
+            total_units_sold = DailyItemSales.objects.filter(item=obj, day=today).values_list('units', flat=True).first() or 0
 
         if total_units_sold > 0:
             d_daystostockout = obj.quantity / total_units_sold
@@ -116,8 +129,9 @@ class TransactionDetailsSerializer(serializers.ModelSerializer):
         return local_time.time()
 
     def get_item_details(self, obj):
-        item = ItemDetails.objects.get(id=obj.item_id)
-        return ItemDetailsSerializer(item).data
+        if obj.item is None:
+            return None
+        return ItemDetailsSerializer(obj.item).data
 
 class CartItemSerializer(serializers.ModelSerializer):
     item = ItemDetailsSerializer()
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from Inventory_Management.models import Supplier, ItemDetails, Transaction
+from Inventory_Management.caching import invalidate
+
+
+@receiver([post_save, post_delete], sender=ItemDetails)
+def item_details_changed(sender, instance, **kwargs):
+    if ItemDetails.supplier.is_cached(instance):
+        business_id = instance.supplier.business_id
+    else:
+        business_id = Supplier.objects.filter(pk=instance.supplier_id).values_list('business_id', flat=True).first()
+    invalidate(business_id)
+
+
+@receiver([post_save, post_delete], sender=Transaction)
+def transaction_changed(sender, instance, **kwargs):
+    invalidate(instance.business_id)
@@ -0,0 +1,55 @@
+from django.db.models import F, Q, Case, When, Value, IntegerField, ExpressionWrapper
+
+from Inventory_Management.models import ItemDetails
+from Inventory_Management.caching import invalidate
+from Inventory_Management.reservations import reserved_quantities, reserved_subquery
+
+
+def adjust_quantity(item, delta):
+    # One conditional UPDATE, so concurrent sellers cannot lose each other's
+    # changes or take stock below zero or from cart reservations. Returns the
+    # new quantity, or None if there was not enough stock. Call inside an
+    # atomic block.
+    items = ItemDetails.objects.filter(pk=item.pk)
+    if delta < 0:
+        items = items.filter(quantity__gte=ExpressionWrapper(reserved_subquery() - delta, output_field=IntegerField()))
+    if not items.update(quantity=F('quantity') + delta):
+        return None
+
+    # The row stays locked by this transaction until commit, so this reads back
+    # exactly what the update wrote.
+    item.quantity = ItemDetails.objects.filter(pk=item.pk).values_list('quantity', flat=True).get()
+    # update() sends no post_save signal.
+    invalidate(item.supplier.business_id)
+    return item.quantity
+
+
+def adjust_quantities(deltas):
+    # Set-based adjust_quantity for {item_id: delta}. The rows are locked and
+    # checked first; then one UPDATE applies every delta. Returns the new
+    # quantities and the ids that lacked stock; if any did, nothing is
+    # changed. Call inside an atomic block.
+    quantities = dict(
+        ItemDetails.objects.select_for_update().filter(pk__in=deltas).order_by('pk').values_list('id', 'quantity')
+    )
+    reserved = reserved_quantities(list(deltas))
+    failed = [item_id for item_id, delta in deltas.items() if delta < 0 and quantities[item_id] - reserved.get(item_id, 0) + delta < 0]
+    if failed:
+        return quantities, failed
+
+    # Still guarded in the WHERE clause, for databases without row locks.
+    condition = Q()
+    for item_id, delta in deltas.items():
+        condition |= Q(pk=item_id, quantity__gte=-delta) if delta < 0 else Q(pk=item_id)
+    increment = Case(*[When(pk=item_id, then=Value(delta)) for item_id, delta in deltas.items()], default=Value(0))
+    if ItemDetails.objects.filter(condition).update(quantity=F('quantity') + increment) != len(deltas):
+        return quantities, [item_id for item_id, delta in deltas.items() if delta < 0]
+
+    return {item_id: quantities[item_id] + delta for item_id, delta in deltas.items()}, []
+
+
+def add_quantities(deltas):
+    # Applies {item_id: delta} to stock with one UPDATE, without any guard, so
+    # only for restocks; anything taking stock goes through adjust_quantities.
+    increment = Case(*[When(pk=item_id, then=Value(delta)) for item_id, delta in deltas.items()], default=Value(0))
+    ItemDetails.objects.filter(pk__in=deltas).update(quantity=F('quantity') + increment)
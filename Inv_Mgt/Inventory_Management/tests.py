@@ -1,7 +1,1222 @@
-from django.test import TestCase
-from .models import MyModel
+import json
+import time
+import tempfile
+import threading
+from io import StringIO, BytesIO
+from pathlib import Path
+from decimal import Decimal
+from datetime import date, datetime, timedelta
+from uuid import uuid4
+from hashlib import md5
+from unittest.mock import patch
 
-class MyModelTest(TestCase):
-    def test_create(self):
-        instance = MyModel.objects.create(name="Test")
-        self.assertEqual(instance.name, "Test")
+import numpy
+import pandas as pd
+import pyarrow.parquet as parquet
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+
+from Inventory_Management.models import CustomUser, Business, BusinessWorker, Supplier, ItemDetails, UpiDetails, Transaction, \
+    DailyItemSales, ImportJob, StockReservation, IdempotencyKey, Cart, CartItem, item_fingerprint
+from Inventory_Management.analytics import update_sales_rollup
+from Inventory_Management.forecasting import forecast_matrix
+from Inventory_Management.caching import cache_stats, cached_result, data_version
+from Inventory_Management.imports import import_items_in_chunks, read_excel_rows
+from Inventory_Management.jobs import run_import_job, is_stale
+
+
+class InventoryTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='secret', role='owner')
+        self.business = Business.objects.create(owner=self.user, business_name='Shop', business_address='1 Road',
+                                                business_city='City', business_state='State', business_country='India')
+        self.supplier = Supplier.objects.create(business=self.business, category='Dairy', distributor_name='Amul')
+        self.upi_details = UpiDetails.objects.create(user=self.user, payee_vpa='owner@upi', payee_name='Owner')
+        self.client.force_authenticate(self.user)
+
+    def create_item(self, item_name, quantity=100, price='10.00', cogs='6.00', **kwargs):
+        return ItemDetails.objects.create(supplier=self.supplier, item_name=item_name, item_type='Milk', size=1,
+                                          unit_of_measurement='l', quantity=quantity, price=Decimal(price),
+                                          cogs=Decimal(cogs), **kwargs)
+
+    def create_sale(self, item, unit, status='success', type='sold'):
+        transaction = Transaction.objects.create(upi_details=self.upi_details, transaction_made_by=self.user,
+                                                 transaction_id=f"txn-{uuid4()}", amount=item.price * unit,
+                                                 item_id=item.id, unit=unit, status=status, type=type)
+        update_sales_rollup(transaction, 'pending')
+        return transaction
+
+    def add_workers(self, count):
+        # An owner-or-worker lookup joins BusinessWorker, one row per worker.
+        for index in range(count):
+            worker = CustomUser.objects.create_user(username=f'staff{index}', email=f'staff{index}@example.com', password='pass',
+                                                    phone_no=f'90000000{index:02d}')
+            BusinessWorker.objects.create(worker=worker, business=self.business)
+
+    def count_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries), response
+
+
+class BusinessLookupTests(InventoryTestCase):
+    def requests(self, item, quantity_delta=5):
+        return [
+            ('post', '/inventory/raise-alert/', {'business_name': 'Shop'}),
+            ('post', '/inventory/alert-count/', {'business_name': 'Shop'}),
+            ('get', '/inventory/transaction-details/', {'business_name': 'Shop'}),
+            ('put', '/inventory/modify-item-quantity/', {'business': 'Shop', 'category': 'Dairy', 'distributors_name': 'Amul',
+                                                         'item_name': 'Milk', 'item_type': 'Milk', 'size': 1, 'uom': 'l',
+                                                         'quantity_delta': quantity_delta}),
+            ('post', '/inventory/modify-item-quantity/batch/',
+             {'business': 'Shop', 'lines': [{'item_id': item.id, 'quantity_delta': quantity_delta}]}),
+            ('get', '/inventory/transactions/export/', {'business_name': 'Shop', 'start_date': timezone.localdate().isoformat()}),
+            ('get', '/inventory/items/export/', {'business_name': 'Shop', 'format': 'csv'}),
+            ('get', '/inventory/stockout-forecast/', {'business_name': 'Shop'}),
+        ]
+
+    def test_owner_of_business_with_workers(self):
+        item = self.create_item('Milk', quantity=10)
+        self.add_workers(2)
+
+        for method, url, data in self.requests(item):
+            with self.subTest(url=url):
+                response = getattr(self.client, method)(url, data, format='json')
+                self.assertEqual(response.status_code, 200, getattr(response, 'data', None))
+
+    def test_worker_and_stranger(self):
+        item = self.create_item('Milk', quantity=10)
+        self.add_workers(2)
+        stranger = CustomUser.objects.create_user(username='stranger', password='pass', phone_no='9876543219')
+
+        for user, expected in ((CustomUser.objects.get(username='staff1'), 200), (stranger, 400)):
+            self.client.force_authenticate(user)
+            # Workers may only take stock out.
+            for method, url, data in self.requests(item, quantity_delta=-1):
+                with self.subTest(user=user.username, url=url):
+                    response = getattr(self.client, method)(url, data, format='json')
+                    self.assertEqual(response.status_code, expected, getattr(response, 'data', None))
+
+
+class SalesPerformanceTests(InventoryTestCase):
+    url = '/inventory/sales-performance/'
+
+    def test_report_is_grouped_per_item(self):
+        milk = self.create_item('Milk')
+        curd = self.create_item('Curd', price='20.00', cogs='15.00')
+        self.create_sale(milk, 2)
+        self.create_sale(milk, 3)
+        self.create_sale(curd, 1)
+        self.create_sale(curd, 4, status='failed')
+
+        response = self.client.get(self.url, {'business': 'Shop', 'time_period': '1'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_revenue'], Decimal('70.00'))
+        self.assertEqual(response.data['total_cogs'], Decimal('45.00'))
+        self.assertEqual(response.data['total_profit_loss'], Decimal('25.00'))
+        self.assertEqual([row['item_name'] for row in response.data['sales_data']], ['Milk', 'Curd'])
+        self.assertEqual(response.data['sales_data'][0]['units_sold'], 5)
+        self.assertEqual(response.data['sales_data'][0]['profit_loss'], Decimal('20.00'))
+        self.assertEqual(response.data['sales_data'][1]['profit_loss_percentage'], Decimal('25'))
+
+    def test_query_count_does_not_grow_with_sales(self):
+        items = [self.create_item(f'Item {i}') for i in range(3)]
+        for item in items:
+            self.create_sale(item, 1)
+        small, _ = self.count_queries('get', self.url, {'business': 'Shop', 'time_period': '30'})
+
+        items += [self.create_item(f'Item {i}') for i in range(3, 30)]
+        for item in items:
+            for _ in range(5):
+                self.create_sale(item, 1)
+        large, response = self.count_queries('get', self.url, {'business': 'Shop', 'time_period': '30'})
+
+        self.assertEqual(len(response.data['sales_data']), 30)
+        self.assertEqual(small, large)
+
+
+class TopItemsTests(InventoryTestCase):
+    url = '/inventory/top-items/'
+
+    def test_ranking_by_metric(self):
+        milk = self.create_item('Milk', price='10.00', cogs='9.00')
+        ghee = self.create_item('Ghee', price='500.00', cogs='400.00')
+        self.create_item('Paneer')
+        self.create_sale(milk, 10)
+        self.create_sale(ghee, 1)
+        self.create_sale(ghee, 5, status='pending')
+
+        response = self.client.get(self.url, {'business': 'Shop'})
+        self.assertEqual([row['item_name'] for row in response.data], ['Milk', 'Ghee', 'Paneer'])
+        self.assertEqual(response.data[0]['units_sold'], 10)
+        self.assertEqual(response.data[0]['rank'], 1)
+
+        response = self.client.get(self.url, {'business': 'Shop', 'metric': 'profit', 'limit': 1})
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['item_name'], 'Ghee')
+        self.assertEqual(response.data[0]['profit_loss'], Decimal('100.00'))
+
+        response = self.client.get(self.url, {'business': 'Shop', 'year': 2000})
+        self.assertEqual([row['units_sold'] for row in response.data], [0, 0, 0])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'metric': 'margin'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'limit': 'ten'}).status_code, 400)
+
+    def test_query_count_does_not_grow_with_catalog(self):
+        for i in range(3):
+            self.create_sale(self.create_item(f'Item {i}'), 1)
+        small, _ = self.count_queries('get', self.url, {'business': 'Shop'})
+
+        for i in range(3, 40):
+            self.create_sale(self.create_item(f'Item {i}'), i)
+        large, response = self.count_queries('get', self.url, {'business': 'Shop'})
+
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(response.data[0]['item_name'], 'Item 39')
+        self.assertEqual(small, large)
+
+
+class DailyItemSalesTests(InventoryTestCase):
+    def rollup(self):
+        return list(DailyItemSales.objects.values_list('item__item_name', 'units', 'revenue', 'cogs'))
+
+    def test_status_changes_update_rollup(self):
+        milk = self.create_item('Milk', quantity=7)
+        sale = self.create_sale(milk, 3, status='pending')
+        self.assertEqual(self.rollup(), [])
+
+        response = self.client.put('/inventory/update-transaction-status/',
+                                   {'transaction_ids': [sale.transaction_id], 'identifier': 'Y'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.rollup(), [('Milk', 3, Decimal('30.00'), Decimal('18.00'))])
+
+        response = self.client.put('/inventory/update-transaction-status/',
+                                   {'transaction_ids': [sale.transaction_id], 'identifier': 'N'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.rollup(), [('Milk', 0, Decimal('0.00'), Decimal('0.00'))])
+        milk.refresh_from_db()
+        self.assertEqual(milk.quantity, 10)
+
+    def test_rebuild_matches_incremental_rollup(self):
+        milk = self.create_item('Milk')
+        curd = self.create_item('Curd')
+        self.create_sale(milk, 2)
+        self.create_sale(milk, 5)
+        self.create_sale(curd, 1)
+        self.create_sale(curd, 1, type='added')
+        incremental = sorted(self.rollup())
+
+        DailyItemSales.objects.all().delete()
+        call_command('rebuild_sales_rollup', business='Shop', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(sorted(self.rollup()), incremental)
+
+    def test_rebuild_keeps_cost_at_sale_time(self):
+        milk = self.create_item('Milk')
+        self.create_sale(milk, 2)
+        ItemDetails.objects.filter(pk=milk.pk).update(cogs=Decimal('9.00'))
+        self.create_sale(self.create_item('Curd', cogs='4.00'), 1)
+        DailyItemSales.objects.filter(item__item_name='Curd').delete()
+
+        call_command('rebuild_sales_rollup', stdout=StringIO())
+
+        # Milk keeps its snapshot; Curd was missing and is costed as it is now.
+        self.assertEqual(sorted(self.rollup()), [('Curd', 1, Decimal('10.00'), Decimal('4.00')),
+                                                 ('Milk', 2, Decimal('20.00'), Decimal('12.00'))])
+
+
+class UpdateTransactionStatusTests(InventoryTestCase):
+    url = '/inventory/update-transaction-status/'
+
+    def resolve(self, transactions, identifier):
+        return self.client.put(self.url, {'transaction_ids': [transaction.transaction_id for transaction in transactions],
+                                          'identifier': identifier}, format='json')
+
+    def test_failed_payments_restock_once_per_item(self):
+        milk = self.create_item('Milk', quantity=0)
+        curd = self.create_item('Curd', quantity=0)
+        sales = [self.create_sale(milk, 2, status='pending'), self.create_sale(milk, 3), self.create_sale(curd, 1)]
+
+        response = self.resolve(sales, 'N')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([result['result'] for result in response.data['results']], ['updated'] * 3)
+        self.assertEqual(set(Transaction.objects.values_list('status', flat=True)), {'failed'})
+        milk.refresh_from_db()
+        curd.refresh_from_db()
+        self.assertEqual((milk.quantity, curd.quantity), (5, 1))
+        self.assertEqual(sorted(DailyItemSales.objects.values_list('item__item_name', 'units')), [('Curd', 0), ('Milk', 0)])
+
+        # Failing them again must not restock twice.
+        response = self.resolve(sales, 'N')
+        self.assertEqual([result['result'] for result in response.data['results']], ['unchanged'] * 3)
+        milk.refresh_from_db()
+        self.assertEqual(milk.quantity, 5)
+
+    def test_unknown_id_changes_nothing(self):
+        milk = self.create_item('Milk', quantity=0)
+        sale = self.create_sale(milk, 2, status='pending')
+
+        response = self.client.put(self.url, {'transaction_ids': [sale.transaction_id, 'txn-missing'], 'identifier': 'Y'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['result'] for result in response.data['results']], ['unchanged', 'not_found'])
+        sale.refresh_from_db()
+        self.assertEqual(sale.status, 'pending')
+        self.assertFalse(DailyItemSales.objects.exists())
+
+    def test_query_count_does_not_grow_with_ids(self):
+        items = [self.create_item(f'Item {i}', quantity=0) for i in range(10)]
+        few = [self.create_sale(item, 1, status='pending') for item in items[:2]]
+        many = [self.create_sale(item, 1, status='pending') for item in items for _ in range(3)]
+
+        small, _ = self.count_queries('put', self.url, {'transaction_ids': [sale.transaction_id for sale in few], 'identifier': 'Y'})
+        large, response = self.count_queries('put', self.url, {'transaction_ids': [sale.transaction_id for sale in many], 'identifier': 'Y'})
+
+        self.assertEqual(small, large)
+        self.assertEqual(DailyItemSales.objects.get(item=items[0]).units, 4)
+
+
+class StockReservationTests(InventoryTestCase):
+    def add_to_cart(self, item, quantity):
+        return self.client.post('/inventory/cart/', {'item_id': item.id, 'quantity': quantity}, format='json')
+
+    def resolve(self, transaction_id, identifier):
+        return self.client.put('/inventory/update-transaction-status/',
+                               {'transaction_ids': [transaction_id], 'identifier': identifier}, format='json')
+
+    def test_cart_reserves_stock(self):
+        milk = self.create_item('Milk', quantity=5)
+
+        response = self.add_to_cart(milk, 3)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(StockReservation.objects.get().quantity, 3)
+
+        response = self.add_to_cart(milk, 3)
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertEqual(response.data['available_quantity'], 2)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+        response = self.client.put('/inventory/modify-item-quantity/', {
+            'business': 'Shop', 'category': 'Dairy', 'distributors_name': 'Amul', 'item_name': 'Milk', 'item_type': 'Milk',
+            'size': 1, 'uom': 'l', 'quantity_delta': -3}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get('/inventory/search-items/', {'business_name': 'Shop', 'item_name': 'Milk'})
+        self.assertEqual((response.data[0]['quantity'], response.data[0]['available_quantity']), (5, 2))
+
+    def test_payment_takes_or_releases_reserved_stock(self):
+        milk = self.create_item('Milk', quantity=5)
+        paid = self.add_to_cart(milk, 2).data['transaction_id']
+        unpaid = self.add_to_cart(milk, 1).data['transaction_id']
+
+        self.assertEqual(self.resolve(paid, 'Y').status_code, 200)
+        self.assertEqual(self.resolve(unpaid, 'N').status_code, 200)
+
+        milk.refresh_from_db()
+        self.assertEqual(milk.quantity, 3)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def expire(self, transaction_id):
+        StockReservation.objects.filter(transaction__transaction_id=transaction_id).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_confirmation_after_sweep_takes_stock(self):
+        milk = self.create_item('Milk', quantity=10)
+        swept = self.add_to_cart(milk, 3).data['transaction_id']
+        self.expire(swept)
+        call_command('sweep_reservations', stdout=StringIO())
+
+        response = self.resolve(swept, 'Y')
+        self.assertEqual(response.status_code, 200, response.data)
+        milk.refresh_from_db()
+        self.assertEqual(milk.quantity, 7)
+        self.assertEqual(DailyItemSales.objects.get().units, 3)
+
+        # It now holds the stock, so failing it puts the stock back once.
+        self.assertEqual(self.resolve(swept, 'N').status_code, 200)
+        self.assertEqual(self.resolve(swept, 'N').data['results'][0]['result'], 'unchanged')
+        milk.refresh_from_db()
+        self.assertEqual(milk.quantity, 10)
+        self.assertEqual(DailyItemSales.objects.get().units, 0)
+
+    def test_confirmation_after_expiry_is_guarded(self):
+        milk = self.create_item('Milk', quantity=3)
+        expired = self.add_to_cart(milk, 3).data['transaction_id']
+        self.expire(expired)
+        live = self.add_to_cart(milk, 3).data['transaction_id']
+
+        response = self.resolve(expired, 'Y')
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertEqual(response.data['results'][0]['result'], 'insufficient_stock')
+        self.assertEqual(Transaction.objects.get(transaction_id=expired).status, 'pending')
+        self.assertEqual(StockReservation.objects.count(), 2)
+
+        self.assertEqual(self.resolve(live, 'Y').status_code, 200)
+        self.assertEqual(self.resolve(expired, 'Y').status_code, 400)
+        milk.refresh_from_db()
+        self.assertEqual(milk.quantity, 0)
+        self.assertEqual(DailyItemSales.objects.get().units, 3)
+
+    def test_sweep_expires_reservations_in_batches(self):
+        milk = self.create_item('Milk', quantity=5)
+        transaction_ids = [self.add_to_cart(milk, 1).data['transaction_id'] for _ in range(3)]
+        StockReservation.objects.filter(transaction__transaction_id__in=transaction_ids[:2]) \
+            .update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        out = StringIO()
+        call_command('sweep_reservations', batch_size=1, stdout=out)
+
+        self.assertIn('Swept 2', out.getvalue())
+        self.assertEqual(list(StockReservation.objects.values_list('transaction__transaction_id', flat=True)), transaction_ids[2:])
+        self.assertEqual(sorted(Transaction.objects.values_list('status', flat=True)), ['failed', 'failed', 'pending'])
+        milk.refresh_from_db()
+        self.assertEqual(milk.quantity, 5)
+
+
+class CartTests(InventoryTestCase):
+    url = '/inventory/cart/'
+
+    def add_to_cart(self, item, quantity):
+        response = self.client.post(self.url, {'item_id': item.id, 'quantity': quantity}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response
+
+    def test_listing_is_one_query_and_shows_own_transactions(self):
+        milk = self.create_item('Milk', quantity=500)
+        worker = CustomUser.objects.create_user(username='worker', password='pass', phone_no='9876543212')
+        BusinessWorker.objects.create(worker=worker, business=self.business)
+        self.client.force_authenticate(worker)
+        self.add_to_cart(milk, 9)
+        self.client.force_authenticate(self.user)
+
+        added = [self.add_to_cart(milk, 1 + i % 3).data for i in range(20)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(len(queries), 1)
+
+        self.assertEqual([line['transaction_id'] for line in response.data], [line['transaction_id'] for line in added])
+        self.assertEqual([line['unit'] for line in response.data], [line['unit'] for line in added])
+        self.assertEqual(response.data[0]['total_price'], Decimal('10.00'))
+
+    def test_quantity_must_be_a_positive_integer(self):
+        milk = self.create_item('Milk', quantity=5)
+        for quantity in (0, -2, 1.5, '2', True, None):
+            with self.subTest(quantity=quantity):
+                response = self.client.post(self.url, {'item_id': milk.id, 'quantity': quantity}, format='json')
+                self.assertEqual(response.status_code, 400, response.data)
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_removing_a_line_releases_its_reservation(self):
+        milk = self.create_item('Milk', quantity=5)
+        line = self.add_to_cart(milk, 3).data
+
+        response = self.client.delete(f"{self.url}{line['cart_item_id']}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(Transaction.objects.get(transaction_id=line['transaction_id']).status, 'failed')
+
+
+    def test_changing_quantity_resizes_the_pending_sale(self):
+        milk = self.create_item('Milk', quantity=10)
+        line = self.add_to_cart(milk, 2).data
+        self.add_to_cart(milk, 3)
+
+        response = self.client.patch(f"{self.url}{line['cart_item_id']}/", {'quantity': 8}, format='json')
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertEqual(response.data['available_quantity'], 7)
+
+        response = self.client.patch(f"{self.url}{line['cart_item_id']}/", {'quantity': 5}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        sale = Transaction.objects.get(transaction_id=line['transaction_id'])
+        self.assertEqual((sale.unit, sale.amount, sale.reservation.quantity), (5, Decimal('50.00'), 5))
+        self.assertEqual(self.client.get(self.url).data[0]['unit'], 5)
+
+        response = self.client.post('/inventory/cart/checkout/')
+        self.assertEqual(response.status_code, 200, response.data)
+        milk.refresh_from_db()
+        self.assertEqual(milk.quantity, 2)
+
+
+class CartCheckoutTests(InventoryTestCase):
+    url = '/inventory/cart/checkout/'
+
+    def add_to_cart(self, item, quantity):
+        response = self.client.post('/inventory/cart/', {'item_id': item.id, 'quantity': quantity}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['transaction_id']
+
+    def test_checkout_takes_stock_and_clears_cart(self):
+        milk = self.create_item('Milk', quantity=10)
+        curd = self.create_item('Curd', quantity=5, price='20.00')
+        added = [self.add_to_cart(milk, 2), self.add_to_cart(curd, 3), self.add_to_cart(milk, 1)]
+        # A swept line has lost its sale, so checkout makes a new one.
+        StockReservation.objects.filter(transaction__transaction_id=added[2]).update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('sweep_reservations', stdout=StringIO())
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['total_amount'], Decimal('90.00'))
+        self.assertEqual(response.data['transaction_ids'][:2], added[:2])
+        self.assertNotEqual(response.data['transaction_ids'][2], added[2])
+        sales = Transaction.objects.filter(transaction_id__in=response.data['transaction_ids'])
+        self.assertEqual({(sale.status, sale.transaction_ref_id) for sale in sales}, {('pending', response.data['transaction_ref_id'])})
+        self.assertFalse(CartItem.objects.exists())
+        self.assertFalse(StockReservation.objects.exists())
+        milk.refresh_from_db()
+        curd.refresh_from_db()
+        self.assertEqual((milk.quantity, curd.quantity), (7, 2))
+
+        # The stock was taken, so a failed payment puts it back.
+        response = self.client.put('/inventory/update-transaction-status/',
+                                   {'transaction_ids': response.data['transaction_ids'], 'identifier': 'N'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        milk.refresh_from_db()
+        self.assertEqual(milk.quantity, 10)
+
+    def test_insufficient_stock_changes_nothing(self):
+        milk = self.create_item('Milk', quantity=5)
+        transaction_id = self.add_to_cart(milk, 3)
+        CartItem.objects.create(cart=Cart.objects.get(user=self.user), item=milk, quantity=3)
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(CartItem.objects.count(), 2)
+        self.assertEqual(list(Transaction.objects.values_list('transaction_id', flat=True)), [transaction_id])
+        self.assertTrue(StockReservation.objects.exists())
+        milk.refresh_from_db()
+        self.assertEqual(milk.quantity, 5)
+
+    def test_query_count_does_not_grow_with_lines(self):
+        items = [self.create_item(f'Item {i}') for i in range(10)]
+        self.add_to_cart(items[0], 1)
+        CartItem.objects.create(cart=Cart.objects.get(user=self.user), item=items[0], quantity=1)
+        small, _ = self.count_queries('post', self.url)
+
+        for item in items:
+            self.add_to_cart(item, 2)
+            CartItem.objects.create(cart=Cart.objects.get(user=self.user), item=item, quantity=1)
+        large, response = self.count_queries('post', self.url)
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.data['transaction_ids']), 20)
+        self.assertEqual(response.data['total_amount'], Decimal('300.00'))
+
+
+class IdempotencyKeyTests(InventoryTestCase):
+    def sell(self, item, key, quantity_delta=-1):
+        return self.client.put('/inventory/modify-item-quantity/', {
+            'business': 'Shop', 'category': 'Dairy', 'distributors_name': 'Amul', 'item_name': item.item_name,
+            'item_type': 'Milk', 'size': 1, 'uom': 'l', 'quantity_delta': quantity_delta}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_first_response(self):
+        milk = self.create_item('Milk', quantity=10)
+
+        first = self.sell(milk, 'sale-1')
+        retry = self.sell(milk, 'sale-1')
+        self.assertEqual((first.status_code, retry.status_code), (200, 200))
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        milk.refresh_from_db()
+        self.assertEqual(milk.quantity, 9)
+
+        self.assertEqual(self.sell(milk, 'sale-2').status_code, 200)
+        self.assertEqual(self.sell(milk, 'sale-1', quantity_delta=-2).status_code, 422)
+        milk.refresh_from_db()
+        self.assertEqual(milk.quantity, 8)
+
+    def test_abandoned_claim_is_taken_over(self):
+        milk = self.create_item('Milk', quantity=10)
+        # A request that claimed the key and then died without answering.
+        claim = IdempotencyKey.objects.create(user=self.user, key='sale-1', request_hash='')
+        IdempotencyKey.objects.filter(pk=claim.pk).update(created_at=timezone.now() - timedelta(minutes=1))
+
+        started = time.monotonic()
+        response = self.sell(milk, 'sale-1')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 200)
+        milk.refresh_from_db()
+        self.assertEqual(milk.quantity, 9)
+
+    def test_expired_keys_are_pruned_in_batches(self):
+        milk = self.create_item('Milk', quantity=10)
+        for key in ('a', 'b', 'c'):
+            self.sell(milk, key)
+        IdempotencyKey.objects.filter(key__in=['a', 'b']).update(created_at=timezone.now() - timedelta(days=2))
+
+        out = StringIO()
+        call_command('prune_idempotency_keys', batch_size=1, stdout=out)
+
+        self.assertIn('Pruned 2', out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['c'])
+
+
+class SearchItemDetailsTests(InventoryTestCase):
+    url = '/inventory/search-items/'
+
+    def test_daystostockout_uses_todays_sales(self):
+        milk = self.create_item('Milk', quantity=10)
+        self.create_item('Milk Powder', quantity=10)
+        self.create_sale(milk, 3)
+
+        response = self.client.get(self.url, {'business_name': 'Shop', 'item_name': 'Milk'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({row['item_name']: row['daystostockout'] for row in response.data}, {'Milk': 4, 'Milk Powder': 0})
+
+    def test_query_count_does_not_grow_with_results(self):
+        for i in range(3):
+            self.create_sale(self.create_item(f'Item {i}'), 1)
+        small, _ = self.count_queries('get', self.url, {'business_name': 'Shop', 'item_name': 'Item'})
+
+        for i in range(3, 40):
+            self.create_sale(self.create_item(f'Item {i}'), 1)
+        large, response = self.count_queries('get', self.url, {'business_name': 'Shop', 'item_name': 'Item'})
+
+        self.assertEqual(len(response.data), 40)
+        self.assertEqual(small, large)
+
+
+class StockoutForecastTests(InventoryTestCase):
+    url = '/inventory/stockout-forecast/'
+
+    def test_forecast_matrix(self):
+        matrix = numpy.zeros((3, 60), dtype=numpy.float32)
+        matrix[0, :] = 2
+        matrix[1, -7:] = 7
+
+        velocity_7, velocity_30, daystostockout = forecast_matrix(matrix, [10, 10, 10])
+
+        self.assertAlmostEqual(float(velocity_7[0]), 2, places=4)
+        self.assertAlmostEqual(float(velocity_30[0]), 2, places=4)
+        self.assertGreater(velocity_7[1], velocity_30[1])
+        self.assertAlmostEqual(float(daystostockout[0]), 5, places=3)
+        self.assertTrue(numpy.isinf(daystostockout[2]))
+
+    def test_endpoint_uses_complete_days(self):
+        milk = self.create_item('Milk', quantity=22)
+        self.create_item('Paneer', quantity=5)
+        yesterday = timezone.localdate() - timedelta(days=1)
+        for offset in range(30):
+            DailyItemSales.objects.create(business=self.business, item=milk, day=yesterday - timedelta(days=offset), units=4)
+        self.create_sale(milk, 50)
+
+        response = self.client.get(self.url, {'business_name': 'Shop'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['item_name'], 'Milk')
+        self.assertEqual(response.data[0]['daystostockout'], 6)
+        self.assertEqual(response.data[1]['daystostockout'], None)
+
+
+class TransactionsByDateTests(InventoryTestCase):
+    url = '/inventory/transaction-details/'
+
+    def test_query_count_does_not_grow_with_transactions(self):
+        milk = self.create_item('Milk')
+        self.create_sale(milk, 1)
+        small, response = self.count_queries('get', self.url, {'business_name': 'Shop'})
+        self.assertEqual(response.data[0]['transaction_made_by'], 'owner')
+        self.assertEqual(response.data[0]['item_details']['item_name'], 'Milk')
+
+        for i in range(30):
+            self.create_sale(self.create_item(f'Item {i}'), 1)
+        large, response = self.count_queries('get', self.url, {'business_name': 'Shop'})
+
+        self.assertEqual(len(response.data), 31)
+        self.assertEqual(small, large)
+
+
+class TransactionExportTests(InventoryTestCase):
+    url = '/inventory/transactions/export/'
+
+    def export(self, **params):
+        params = {'business_name': 'Shop', 'start_date': timezone.localdate().isoformat(), **params}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        milk = self.create_item('Milk')
+        first = self.create_sale(milk, 2)
+        self.create_sale(milk, 1, status='failed')
+
+        lines = self.export().splitlines()
+
+        self.assertEqual(lines[0].split(',')[:3], ['transaction_id', 'transaction_ref_id', 'created_at'])
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith(first.transaction_id))
+        self.assertIn(',Milk,2,20.00,owner', lines[1])
+
+    def test_ndjson_export(self):
+        milk = self.create_item('Milk')
+        self.create_sale(milk, 2)
+        self.create_sale(milk, 1, status='failed')
+
+        lines = self.export(format='ndjson', status='success').splitlines()
+
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual((row['item_name'], row['unit'], row['amount']), ('Milk', 2, '20.00'))
+
+    def test_invalid_format(self):
+        response = self.client.get(self.url, {'business_name': 'Shop', 'start_date': '2023-01-01', 'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AnalyticsCacheTests(InventoryTestCase):
+    def test_results_are_cached_until_business_data_changes(self):
+        milk = self.create_item('Milk', quantity=1, alert_quantity=5)
+        self.create_sale(milk, 2)
+
+        first, response = self.count_queries('get', '/inventory/top-items/', {'business': 'Shop'})
+        cached, response = self.count_queries('get', '/inventory/top-items/', {'business': 'Shop'})
+        self.assertLess(cached, first)
+        self.assertEqual(cache_stats('top-items'), {'hits': 1, 'misses': 1})
+
+        self.create_sale(milk, 3)
+        response = self.client.get('/inventory/top-items/', {'business': 'Shop'})
+        self.assertEqual(response.data[0]['units_sold'], 5)
+        self.assertEqual(cache_stats('top-items'), {'hits': 1, 'misses': 2})
+
+    def test_alert_count_invalidated_by_item_save(self):
+        milk = self.create_item('Milk', quantity=10, alert_quantity=5)
+        response = self.client.post('/inventory/alert-count/', {'business_name': 'Shop'}, format='json')
+        self.assertEqual(response.data, {'alert_items_count': 0})
+
+        milk.quantity = 2
+        milk.save()
+        response = self.client.post('/inventory/alert-count/', {'business_name': 'Shop'}, format='json')
+        self.assertEqual(response.data, {'alert_items_count': 1})
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'report'
+
+        threads = [threading.Thread(target=cached_result, args=(self.business.id, 'test', {}, compute)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache_stats('test'), {'hits': 4, 'misses': 1})
+
+    def test_timed_out_waiter_leaves_the_lock_alone(self):
+        key = f"analytics:test:{self.business.id}:{data_version(self.business.id)}:{md5(b'{}').hexdigest()}"
+        cache.set(f"{key}:lock", 'holder', 60)
+
+        with patch('Inventory_Management.caching.LOCK_TIMEOUT', 0.1):
+            self.assertEqual(cached_result(self.business.id, 'test', {}, lambda: 'report'), 'report')
+        self.assertEqual(cache.get(f"{key}:lock"), 'holder')
+
+
+class ParquetSnapshotTests(InventoryTestCase):
+    def test_incremental_snapshot_appends_new_transactions(self):
+        milk = self.create_item('Milk', additional_info={'fat': '3%'})
+        self.create_sale(milk, 1)
+        self.create_sale(milk, 2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('export_parquet_snapshot', 'Shop', directory, chunk_size=1, stdout=StringIO())
+            self.create_sale(milk, 3)
+            call_command('export_parquet_snapshot', 'Shop', directory, '--incremental', stdout=StringIO())
+
+            root = Path(directory) / str(self.business.id)
+            items = parquet.read_table(root / 'items.parquet').to_pylist()
+            transactions = parquet.read_table(root / 'transactions').to_pylist()
+
+        self.assertEqual(json.loads(items[0]['additional_info']), {'fat': '3%'})
+        self.assertEqual(sorted(row['unit'] for row in transactions), [1, 2, 3])
+
+    def test_endpoint_is_owner_only(self):
+        self.create_sale(self.create_item('Milk'), 2)
+
+        response = self.client.get('/inventory/snapshot/', {'business_name': 'Shop', 'table': 'transactions'})
+        self.assertEqual(response.status_code, 200)
+        table = parquet.read_table(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(table.column('amount').to_pylist(), [Decimal('20.00')])
+
+        worker = CustomUser.objects.create_user(username='worker', email='worker@example.com', password='secret',
+                                             phone_no='9876543210')
+        BusinessWorker.objects.create(worker=worker, business=self.business)
+        self.client.force_authenticate(worker)
+        response = self.client.get('/inventory/snapshot/', {'business_name': 'Shop'})
+        self.assertEqual(response.status_code, 403)
+
+
+class UpdateItemQuantityTests(InventoryTestCase):
+    url = '/inventory/modify-item-quantity/'
+
+    def modify(self, quantity_delta, additional_info=None):
+        return self.client.put(self.url, {'business': 'Shop', 'category': 'Dairy', 'distributors_name': 'Amul',
+                                          'item_name': 'Milk', 'item_type': 'Milk', 'size': 1, 'uom': 'l',
+                                          'quantity_delta': quantity_delta, 'additional_info': additional_info}, format='json')
+
+    def test_fingerprint_is_kept_up_to_date(self):
+        item = self.create_item('Milk', additional_info={'fat': '3%', 'brand': 'Amul'})
+        self.assertEqual(item.fingerprint, item_fingerprint(self.supplier.id, 'Milk', 'Milk', 1.0, 'l', {'brand': 'Amul', 'fat': '3%'}))
+
+        item.additional_info = {'fat': '6%'}
+        item.save(update_fields=['additional_info'])
+        item.refresh_from_db()
+        self.assertEqual(item.fingerprint, item_fingerprint(self.supplier.id, 'Milk', 'Milk', 1, 'l', {'fat': '6%'}))
+
+    def test_variant_is_found_by_fingerprint(self):
+        full_fat = self.create_item('Milk', quantity=10, additional_info={'fat': '6%', 'brand': 'Amul'})
+        toned = self.create_item('Milk', quantity=10, additional_info={'fat': '3%', 'brand': 'Amul'})
+
+        response = self.modify(-4, {'brand': 'Amul', 'fat': '3%'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['item_id'], toned.id)
+        full_fat.refresh_from_db()
+        toned.refresh_from_db()
+        self.assertEqual((full_fat.quantity, toned.quantity), (10, 6))
+
+        response = self.modify(-1, {'fat': '1%'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_variant_is_found_by_subset_of_additional_info(self):
+        self.create_item('Milk', quantity=10, additional_info={'batch': 'B1', 'expiry': '2024-01-31'})
+        b2 = self.create_item('Milk', quantity=10, additional_info={'batch': 'B2', 'expiry': '2024-02-29', 'tags': ['cold']})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.modify(-3, {'batch': 'B2'})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['item_id'], b2.id)
+        # Matched in SQL, not by loading every variant.
+        self.assertTrue([query for query in queries.captured_queries if 'JSON_EXTRACT' in query['sql'] or '@>' in query['sql']])
+
+        self.assertEqual(self.modify(-1, {'tags': ['cold'], 'batch': 'B2'}).data['item_id'], b2.id)
+        self.assertEqual(self.modify(-1, {'batch': 'B3'}).status_code, 400)
+        b2.refresh_from_db()
+        self.assertEqual(b2.quantity, 6)
+
+
+class BatchUpdateItemQuantityTests(InventoryTestCase):
+    url = '/inventory/modify-item-quantity/batch/'
+
+    def post(self, lines):
+        return self.client.post(self.url, {'business': 'Shop', 'lines': lines}, format='json')
+
+    def identity(self, item_name, **line):
+        return {'category': 'Dairy', 'distributors_name': 'Amul', 'item_name': item_name, 'item_type': 'Milk',
+                'size': 1, 'uom': 'l', **line}
+
+    def test_applies_all_lines(self):
+        milk = self.create_item('Milk', quantity=10)
+        curd = self.create_item('Curd', quantity=10, additional_info={'fat': '3%'})
+
+        response = self.post([
+            {'item_id': milk.id, 'quantity_delta': 5},
+            self.identity('Curd', additional_info={'fat': '3%'}, quantity_delta=-4),
+            {'item_id': curd.id, 'quantity_delta': -2},
+        ])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([line['updated_quantity'] for line in response.data['results']], [15, 4, 4])
+
+        milk.refresh_from_db()
+        curd.refresh_from_db()
+        self.assertEqual((milk.quantity, curd.quantity), (15, 4))
+        restock = Transaction.objects.get()
+        self.assertEqual((restock.item_id, restock.business_id, restock.unit, restock.amount, restock.type),
+                         (milk.id, self.business.id, 5, Decimal('50.00'), 'added'))
+
+    def test_any_failed_line_changes_nothing(self):
+        milk = self.create_item('Milk', quantity=10)
+        curd = self.create_item('Curd', quantity=1)
+
+        response = self.post([{'item_id': milk.id, 'quantity_delta': 5}, {'item_id': curd.id, 'quantity_delta': -2}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['results'][1]['error'], 'Insufficient quantity in stock.')
+        self.assertNotIn('error', response.data['results'][0])
+
+        response = self.post([{'item_id': milk.id, 'quantity_delta': 5}, self.identity('Ghee', quantity_delta=-1)])
+        self.assertEqual(response.data['results'][1]['error'], 'Item not found.')
+
+        milk.refresh_from_db()
+        curd.refresh_from_db()
+        self.assertEqual((milk.quantity, curd.quantity), (10, 1))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_query_count_does_not_grow_with_lines(self):
+        items = [self.create_item(f'Item {i}', quantity=100) for i in range(30)]
+
+        small, _ = self.count_queries('post', self.url, {'business': 'Shop', 'lines': [
+            {'item_id': item.id, 'quantity_delta': 1} for item in items[:3]] + [self.identity('Item 0', quantity_delta=2)]})
+        large, response = self.count_queries('post', self.url, {'business': 'Shop', 'lines': [
+            {'item_id': item.id, 'quantity_delta': -1} for item in items] + [self.identity('Item 0', quantity_delta=2)]})
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(small, large)
+
+
+class ConcurrentStockAdjustmentTests(TransactionTestCase):
+    sellers = 50
+
+    def setUp(self):
+        # SQLite's in-memory test database is one shared connection-level
+        # cache: concurrent writers fail with "database table is locked"
+        # instead of waiting, so the race needs a file or a server database.
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('needs a file-backed or server test database')
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='owner', password='pass')
+        business = Business.objects.create(owner=self.user, business_name='Shop', business_type='Grocery')
+        supplier = Supplier.objects.create(business=business, category='Dairy', distributor_name='Amul')
+        UpiDetails.objects.create(user=self.user, payee_vpa='owner@upi', payee_name='Owner')
+        self.item = ItemDetails.objects.create(supplier=supplier, item_name='Milk', item_type='Milk', size=1,
+                                               unit_of_measurement='l', quantity=30, price=Decimal('10.00'))
+
+    def test_parallel_sellers_never_lose_updates(self):
+        barrier = threading.Barrier(self.sellers)
+        statuses = []
+
+        def sell():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            barrier.wait()
+            try:
+                response = client.put('/inventory/modify-item-quantity/', {
+                    'business': 'Shop', 'category': 'Dairy', 'distributors_name': 'Amul', 'item_name': 'Milk',
+                    'item_type': 'Milk', 'size': 1, 'uom': 'l', 'quantity_delta': -1}, format='json')
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=sell) for _ in range(self.sellers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 0)
+        self.assertEqual((statuses.count(200), statuses.count(400)), (30, 20))
+
+    def test_duplicate_submissions_collapse(self):
+        barrier = threading.Barrier(10)
+        responses = []
+
+        def submit():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            barrier.wait()
+            try:
+                responses.append(client.post('/inventory/cart/', {'item_id': self.item.id, 'quantity': 2}, format='json',
+                                             HTTP_IDEMPOTENCY_KEY='retry-1'))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual({response.status_code for response in responses}, {201})
+        self.assertEqual(len({response.data['transaction_id'] for response in responses}), 1)
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(StockReservation.objects.get().quantity, 2)
+
+
+class ImportExcelDataTests(InventoryTestCase):
+    url = '/inventory/import-item-excel/'
+    columns = ['Business', 'Category', 'Distributor Name', 'Item Name', 'Item Type', 'Size', 'Uom', 'Quantity',
+               'Price', 'COGS', 'Alert', 'Additional Info', 'Date']
+
+    def workbook(self, rows):
+        buffer = BytesIO()
+        pd.DataFrame(rows, columns=self.columns).to_excel(buffer, sheet_name='Data', index=False)
+        buffer.seek(0)
+        buffer.name = 'items.xlsx'
+        return buffer
+
+    def row(self, item_name, quantity, info='{}', category='Dairy', distributor='Amul'):
+        return ['Shop', category, distributor, item_name, 'Milk', 1, 'l', quantity, 10, 6, 2, info, datetime(2023, 5, 1)]
+
+    def upload(self, rows):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'file': self.workbook(rows)}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        return len(queries), response
+
+    def test_idempotency_key_covers_file_contents(self):
+        def post(rows):
+            return self.client.post(self.url, {'file': self.workbook(rows)}, format='multipart', HTTP_IDEMPOTENCY_KEY='import-1')
+
+        self.assertEqual(post([self.row('Milk', 5)]).status_code, 201)
+        self.assertEqual(post([self.row('Milk', 5)])['Idempotent-Replayed'], 'true')
+        # Same file name and form fields, different workbook.
+        self.assertEqual(post([self.row('Milk', 5), self.row('Curd', 3)]).status_code, 422)
+        self.assertEqual(list(ItemDetails.objects.values_list('item_name', 'quantity')), [('Milk', 5)])
+
+    def test_import_adds_and_updates(self):
+        existing = self.create_item('Milk', quantity=1, additional_info={'fat': '3%'})
+        existing.size = 1
+        existing.save()
+
+        queries, response = self.upload([
+            self.row('Milk', 40, '{"fat": "3%"}'),
+            self.row('Milk', 50, '{"fat": "6%"}'),
+            self.row('Ghee', 5, category='Fats', distributor='Nandini'),
+            self.row('Ghee', 7, category='Fats', distributor='Nandini'),
+        ])
+
+        self.assertEqual((response.data['added_rows'], response.data['updated_rows']), (2, 2))
+        existing.refresh_from_db()
+        self.assertEqual(existing.quantity, 40)
+        ghee = ItemDetails.objects.get(item_name='Ghee')
+        self.assertEqual((ghee.quantity, ghee.supplier.distributor_name), (7, 'Nandini'))
+        self.assertEqual(ItemDetails.objects.count(), 3)
+
+    def test_numeric_names_match_on_reimport(self):
+        self.upload([self.row(500, 1, category=2023, distributor=7)])
+        item = ItemDetails.objects.get()
+        self.assertEqual(item.fingerprint, item.compute_fingerprint())
+        item.save()
+
+        _, response = self.upload([self.row(500, 2, category=2023, distributor=7)])
+        self.assertEqual((response.data['added_rows'], response.data['updated_rows']), (0, 1))
+        self.assertEqual((ItemDetails.objects.count(), Supplier.objects.count()), (1, 2))
+
+    def test_query_count_does_not_grow_with_rows(self):
+        small, _ = self.upload([self.row(f'Item {i}', i) for i in range(3)])
+        large, response = self.upload([self.row(f'Item {i}', i) for i in range(3, 63)])
+
+        self.assertEqual((response.data['added_rows'], response.data['updated_rows']), (60, 0))
+        self.assertEqual(small, large)
+
+    def test_streaming_import_matches_pandas_import(self):
+        rows = [self.row(f'Item {i}', i, f'{{"batch": {i % 2}}}') for i in range(7)] + [self.row('Item 0', 99, '{"batch": 0}')]
+        self.assertEqual(import_items_in_chunks(read_excel_rows(self.workbook(rows)), chunk_size=3), (7, 1))
+        self.assertEqual(ItemDetails.objects.get(item_name='Item 0').quantity, 99)
+        self.assertEqual(ItemDetails.objects.get(item_name='Item 3').additional_info, {'batch': 1})
+
+        response = self.client.post(self.url, {'file': self.workbook(rows), 'stream': 'true'}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['added_rows'], response.data['updated_rows']), (0, 8))
+
+    def encoded(self, rows, file_format, columns=None):
+        df = pd.DataFrame(rows, columns=self.columns)
+        df['Date'] = df['Date'].dt.date
+        df = df[columns or self.columns]
+        buffer = BytesIO()
+        if file_format == 'parquet':
+            df.to_parquet(buffer, index=False)
+        else:
+            buffer.write(df.to_csv(index=False, sep='\t' if file_format == 'tsv' else ',').encode())
+        buffer.seek(0)
+        buffer.name = f'items.{file_format}'
+        return buffer
+
+    def test_csv_tsv_and_parquet_imports(self):
+        rows = [self.row('Milk', 5, '{"fat": "3%"}'), self.row('Ghee', 7, category='Fats', distributor='Nandini')]
+        for file_format, added in (('csv', 2), ('tsv', 0), ('parquet', 0)):
+            # Columns are matched by name, so their order in the file does not matter.
+            buffer = self.encoded(rows, file_format, columns=list(reversed(self.columns)))
+            response = self.client.post(self.url, {'file': buffer}, format='multipart')
+            self.assertEqual(response.status_code, 201, response.data)
+            self.assertEqual((response.data['added_rows'], response.data['updated_rows']), (added, 2 - added))
+
+        milk = ItemDetails.objects.get(item_name='Milk')
+        self.assertEqual((milk.quantity, milk.additional_info, milk.imported_date.isoformat()), (5, {'fat': '3%'}, '2023-05-01'))
+        self.assertEqual(ItemDetails.objects.count(), 2)
+
+    def test_column_mapping_and_missing_columns(self):
+        buffer = self.encoded([self.row('Milk', 5)], 'csv')
+        buffer = BytesIO(buffer.getvalue().replace(b'Item Name', b'Product'))
+        buffer.name = 'feed.csv'
+        response = self.client.post(self.url, {'file': buffer}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Item Name', response.data['message'])
+
+        buffer.seek(0)
+        response = self.client.post(self.url, {'file': buffer, 'column_mapping': json.dumps({'item_name': 'Product'})}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertTrue(ItemDetails.objects.filter(item_name='Milk').exists())
+
+    def test_dry_run_reports_changes_without_writing(self):
+        milk = self.create_item('Milk', quantity=40, price='10.00', cogs='6.00', alert_quantity=2,
+                                imported_date=date(2023, 5, 1))
+        curd = self.create_item('Curd', quantity=3, price='10.00', cogs='6.00', alert_quantity=2,
+                                imported_date=date(2023, 5, 1))
+        rows = [self.row('Milk', 40), self.row('Curd', 8), self.row('Ghee', 5, category='Fats', distributor='Nandini')]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'file': self.workbook(rows), 'dry_run': 'true'}, format='multipart')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertFalse([query for query in queries.captured_queries if not query['sql'].startswith('SELECT')])
+
+        self.assertEqual([entry['item_name'] for entry in response.data['added']], ['Ghee'])
+        self.assertEqual([entry['item_id'] for entry in response.data['untouched']], [milk.id])
+        [change] = response.data['updated']
+        self.assertEqual((change['item_id'], change['old']['quantity'], change['new']['quantity']), (curd.id, 3, 8))
+        self.assertEqual(change['new']['price'], Decimal('10.00'))
+
+        curd.refresh_from_db()
+        self.assertEqual(curd.quantity, 3)
+        self.assertEqual(ItemDetails.objects.count(), 2)
+        self.assertFalse(Supplier.objects.filter(category='Fats').exists())
+
+    def test_unknown_business_imports_nothing(self):
+        rows = [self.row('Milk', 1), ['Other'] + self.row('Curd', 1)[1:]]
+        response = self.client.post(self.url, {'file': self.workbook(rows)}, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ItemDetails.objects.exists())
+
+
+class ItemCatalogueExportTests(InventoryTestCase):
+    url = '/inventory/items/export/'
+
+    def setUp(self):
+        super().setUp()
+        self.milk = self.create_item('Milk', quantity=40, additional_info={'fat': '3%'}, alert_quantity=5)
+        self.ghee = self.create_item('Ghee', quantity=7, price='99.50')
+
+    def export(self, export_format):
+        response = self.client.get(self.url, {'business_name': 'Shop', 'format': export_format})
+        self.assertEqual(response.status_code, 200)
+        buffer = BytesIO(b''.join(response.streaming_content))
+        buffer.name = f'items.{export_format}'
+        return buffer
+
+    def test_xlsx_export_round_trips_through_import(self):
+        buffer = self.export('xlsx')
+        df = pd.read_excel(buffer, sheet_name='Data')
+        self.assertEqual(list(df.columns), ImportExcelDataTests.columns)
+        self.assertEqual(json.loads(df.loc[df['Item Name'] == 'Milk', 'Additional Info'].item()), {'fat': '3%'})
+
+        buffer.seek(0)
+        response = self.client.post('/inventory/import-item-excel/', {'file': buffer}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['added_rows'], response.data['updated_rows']), (0, 2))
+        self.ghee.refresh_from_db()
+        self.assertEqual((self.ghee.price, self.ghee.imported_date), (Decimal('99.50'), self.ghee.created_at))
+
+    def test_csv_export_matches_catalogue(self):
+        ItemDetails.objects.filter(pk=self.milk.pk).update(imported_date=date(2023, 5, 1))
+
+        response = self.client.post('/inventory/import-item-excel/', {'file': self.export('csv'), 'dry_run': 'true'}, format='multipart')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data['added']), 0)
+        self.assertEqual([entry['item_id'] for entry in response.data['untouched']], [self.milk.id])
+        # Ghee was added by hand; the export stands in created_at, which the import would store.
+        [ghee] = response.data['updated']
+        self.assertEqual(ghee['item_id'], self.ghee.id)
+        self.assertEqual((ghee['old']['imported_date'], ghee['new']['imported_date']), (None, self.ghee.created_at))
+        self.assertEqual({field: ghee['old'][field] for field in ('quantity', 'price')},
+                         {field: ghee['new'][field] for field in ('quantity', 'price')})
+
+        response = self.client.post('/inventory/import-item-excel/', {'file': self.export('csv')}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        response = self.client.post('/inventory/import-item-excel/', {'file': self.export('csv'), 'dry_run': 'true'}, format='multipart')
+        self.assertEqual((len(response.data['updated']), len(response.data['untouched'])), (0, 2))
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get(self.url, {'business_name': 'Shop', 'format': 'pdf'}).status_code, 400)
+
+
+class ImportJobTests(InventoryTestCase):
+    url = ImportExcelDataTests.url
+    columns = ImportExcelDataTests.columns
+    workbook = ImportExcelDataTests.workbook
+    row = ImportExcelDataTests.row
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def submit(self, rows):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.url, {'file': self.workbook(rows), 'background': 'true'}, format='multipart')
+        self.assertEqual(response.status_code, 202, response.data)
+        self.assertEqual(len(callbacks), 1)
+        return ImportJob.objects.get(pk=response.data['job_id'])
+
+    def test_background_import_reports_progress(self):
+        job = self.submit([self.row(f'Item {i}', i) for i in range(5)])
+        self.assertEqual(job.status, 'queued')
+        self.assertFalse(ItemDetails.objects.exists())
+
+        run_import_job(job.id, chunk_size=2)
+
+        response = self.client.get(f'/inventory/import-jobs/{job.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual((response.data['rows_processed'], response.data['added_rows'], response.data['updated_rows']), (5, 5, 0))
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(ItemDetails.objects.count(), 5)
+
+    def test_resumes_from_last_committed_chunk(self):
+        job = self.submit([self.row(f'Item {i}', i) for i in range(5)])
+        # A worker committed the first chunk, then died holding the job.
+        ImportJob.objects.filter(pk=job.id).update(status='running', rows_processed=2, added_rows=2, locked_by='gone:1',
+                                                   heartbeat_at=timezone.now() - timedelta(minutes=10), started_at=timezone.now())
+        job.refresh_from_db()
+        self.assertTrue(is_stale(job))
+
+        run_import_job(job.id, chunk_size=2)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_processed, job.added_rows), ('completed', 5, 5))
+        self.assertEqual(sorted(ItemDetails.objects.values_list('item_name', flat=True)), ['Item 2', 'Item 3', 'Item 4'])
+
+    def test_status_poll_resumes_only_that_job(self):
+        waiting = self.submit([self.row('Milk', 1)])
+        abandoned = self.submit([self.row('Ghee', 1)])
+        ImportJob.objects.filter(pk=abandoned.id).update(status='running', locked_by='gone:1',
+                                                         heartbeat_at=timezone.now() - timedelta(minutes=10))
+        self.assertFalse(is_stale(waiting))
+
+        with patch('Inventory_Management.views.submit_import_job') as submit:
+            self.client.get(f'/inventory/import-jobs/{waiting.id}/')
+            submit.assert_not_called()
+            self.client.get(f'/inventory/import-jobs/{abandoned.id}/')
+            submit.assert_called_once_with(abandoned.id)
+
+    def test_live_job_is_not_claimed_twice(self):
+        job = self.submit([self.row('Milk', 1)])
+        ImportJob.objects.filter(pk=job.id).update(status='running', locked_by='other:1', heartbeat_at=timezone.now())
+
+        run_import_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_processed), ('running', 0))
+        self.assertFalse(ItemDetails.objects.exists())
+
+    def test_failed_chunk_is_reported(self):
+        job = self.submit([self.row('Milk', 1), self.row('Curd', 1), ['Other'] + self.row('Ghee', 1)[1:]])
+
+        run_import_job(job.id, chunk_size=2)
+
+        response = self.client.get(f'/inventory/import-jobs/{job.id}/')
+        self.assertEqual((response.data['status'], response.data['rows_processed']), ('failed', 2))
+        self.assertEqual(len(response.data['errors']), 1)
+        self.assertEqual(ItemDetails.objects.count(), 2)
+
+    def test_other_users_cannot_see_job(self):
+        job = self.submit([self.row('Milk', 1)])
+        other = CustomUser.objects.create_user(username='other', password='pass', phone_no='9876543211')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/inventory/import-jobs/{job.id}/').status_code, 404)
@@ -4,7 +4,9 @@ from Inventory_Management.views import CustomUserCreateAPIView, LoginAPIView, Lo
     SearchItemDetailsAPIView, ItemAlertListAPIView, ItemAlertCountAPIView, GenerateQRCodeAPIView, UpdateItemQuantityAPIView, ImportExcelDataAPIView, \
     UpdateTransactionStatusAPIView, CreateUpiDetailsAPIView, TransactionsByDateView, SalesPerformanceAPIView, TopItemsAPIView, CartItemListCreateAPIView, \
     CartItemRetrieveUpdateDestroyAPIView,ListUPIDetails,UPIDeleteAPIView, PasswordResetRequestCreateAPIView, VerifyOTPAPIView, ResetPasswordAPIView, \
-    ItemDetailsUpdateDeleteView, CartItemCountAPIView, CurrentUserAPIView, UpdateUserAPIView, BusinessWorkerCreateAPIView, HelloWorldView
+    ItemDetailsUpdateDeleteView, CartItemCountAPIView, CurrentUserAPIView, UpdateUserAPIView, BusinessWorkerCreateAPIView, HelloWorldView, \
+    StockoutForecastAPIView, TransactionExportAPIView, ParquetSnapshotAPIView, ImportJobStatusAPIView, \
+    ItemCatalogueExportAPIView, BatchUpdateItemQuantityAPIView, CartCheckoutAPIView
 
 urlpatterns = [
     path('register-user/', CustomUserCreateAPIView.as_view(), name='register'),
@@ -27,6 +29,7 @@ urlpatterns = [
     path('suppliers/', SearchSupplierAPIView.as_view(), name='suppliers-list'),
 
     path('items/', ItemDetailsListAPIView.as_view()),
+    path('items/export/', ItemCatalogueExportAPIView.as_view(), name='items-export'),
     path('add-item/', ItemDetailsCreateAPIView.as_view(), name='create_item_info'),
     path('search-items/', SearchItemDetailsAPIView.as_view()),
     path('raise-alert/', ItemAlertListAPIView.as_view()),
@@ -38,15 +41,21 @@ urlpatterns = [
     path('del_upi_details/', UPIDeleteAPIView.as_view(), name='del_upi'),
     path('generate-qr-code/', GenerateQRCodeAPIView.as_view()),
     path('modify-item-quantity/', UpdateItemQuantityAPIView.as_view()),
+    path('modify-item-quantity/batch/', BatchUpdateItemQuantityAPIView.as_view(), name='modify-item-quantity-batch'),
     path('update-transaction-status/', UpdateTransactionStatusAPIView.as_view()),
     path('transaction-details/', TransactionsByDateView.as_view()),
+    path('transactions/export/', TransactionExportAPIView.as_view(), name='transactions-export'),
+    path('snapshot/', ParquetSnapshotAPIView.as_view(), name='parquet-snapshot'),
     
     path('sales-performance/', SalesPerformanceAPIView.as_view()),
     path('top-items/', TopItemsAPIView.as_view(), name='top-items'),
+    path('stockout-forecast/', StockoutForecastAPIView.as_view(), name='stockout-forecast'),
 
     path('import-item-excel/', ImportExcelDataAPIView.as_view()),
+    path('import-jobs/<int:pk>/', ImportJobStatusAPIView.as_view(), name='import-job-status'),
 
     path('cart/', CartItemListCreateAPIView.as_view(), name='cart-list-create'),
+    path('cart/checkout/', CartCheckoutAPIView.as_view(), name='cart-checkout'),
     path('cart/<int:pk>/', CartItemRetrieveUpdateDestroyAPIView.as_view(), name='cart-item-detail'),
     path('cart-item-count/', CartItemCountAPIView.as_view(), name='cart-count-detail'),
 
@@ -1,5 +1,6 @@
 import json
 import base64
+import tempfile
 import qrcode
 # import cv2
 # import pytesseract
@@ -16,11 +17,12 @@ from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from datetime import datetime, date, timedelta
 from django.http.multipartparser import MultiPartParser
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse
 from django.db.models import Q, F
 from django.conf import settings
 from django.shortcuts import render
 from django.db import IntegrityError
+from django.db import transaction as db_transaction
 from django.contrib.auth import authenticate
 from django.core.files.base import ContentFile
 
@@ -32,10 +34,28 @@ from rest_framework import generics, permissions
 from rest_framework.exceptions import ValidationError
 
 from Inventory_Management.models import CustomUser, PasswordResetRequest, Business, Supplier, ItemDetails, UpiDetails, \
-    Transaction, CartItem, Cart, BusinessWorker
+    Transaction, CartItem, Cart, BusinessWorker, ImportJob, StockReservation, item_fingerprint, matching_variants
 from Inventory_Management.serializers import CustomUserSerializer, PasswordResetRequestSerializer, BusinessSerializer, \
     SupplierSerializer, ItemDetailsSerializer, ItemDetailsSearchSerializer, ItemDetailAlertSerializer, TransactionSerializer, \
     UpiDetailsSerializer, TransactionDetailsSerializer, CartItemSerializer, BusinessWorkerSerializer
+from Inventory_Management.analytics import sales_performance, top_items, update_sales_rollup, update_sales_rollups, units_sold_on, \
+    TOP_ITEMS_METRICS
+from Inventory_Management.forecasting import stockout_forecast
+from Inventory_Management.caching import cached_result, invalidate
+from Inventory_Management.imports import import_items, import_items_in_chunks, parse_excel_rows, read_rows, column_mapping, \
+    file_format, diff_items
+from Inventory_Management.stock import adjust_quantity, adjust_quantities, add_quantities
+from Inventory_Management.idempotency import idempotent
+from Inventory_Management.reservations import reserve, resize, reserved_quantities, available_quantity
+from Inventory_Management.jobs import submit_import_job, is_stale
+from Inventory_Management.exports import TRANSACTION_COLUMNS, SNAPSHOT_COLUMNS, transaction_rows, stream_csv, stream_ndjson, \
+    write_parquet, catalogue_header, catalogue_rows, write_catalogue_xlsx
+
+
+def business_for(user, business_name):
+    # Owned or worked at. The join yields one row per worker of the business,
+    # so without distinct() .get() fails once it has more than one.
+    return Business.objects.filter(Q(owner=user) | Q(businessworker__worker=user), business_name=business_name).distinct().get()
 
 
 # Create your views here.
@@ -423,11 +443,11 @@ class SearchItemDetailsAPIView(generics.ListAPIView):
             if not businesses.exists():
                 return ItemDetails.objects.none()
 
-        queryset = ItemDetails.objects.filter(supplier__business__in=businesses)
+        queryset = ItemDetails.objects.filter(supplier__business__in=businesses).select_related('supplier__business')
         
         if item_name and item_name.isdigit():
             try:
-                item = ItemDetails.objects.get(id=item_name, supplier__business__in=businesses)
+                item = ItemDetails.objects.select_related('supplier__business').get(id=item_name, supplier__business__in=businesses)
                 return [item,]  # Return a list containing the item
             except ItemDetails.DoesNotExist:
                 pass
@@ -456,7 +476,11 @@ class SearchItemDetailsAPIView(generics.ListAPIView):
             if not queryset.exists():
                 return Response({'error': 'No match found'}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = self.get_serializer(queryset, many=True)
+        items = list(queryset)
+        context = self.get_serializer_context()
+        context['units_sold_today'] = units_sold_on(timezone.localdate(), [item.id for item in items])
+        context['reserved_quantities'] = reserved_quantities([item.id for item in items])
+        serializer = self.get_serializer(items, many=True, context=context)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
 
@@ -469,7 +493,7 @@ class ItemAlertListAPIView(generics.GenericAPIView):
         business_name = request.data.get('business_name')
 
         try:
-            business = Business.objects.get(Q(owner=user) | Q(businessworker__worker=user), business_name=business_name)
+            business = business_for(user, business_name)
             suppliers = Supplier.objects.filter(business=business)
 
             alert_items = []
@@ -497,13 +521,12 @@ class ItemAlertCountAPIView(generics.GenericAPIView):
         business_name = request.data.get('business_name')
 
         try:
-            business = Business.objects.get(Q(owner=user) | Q(businessworker__worker=user), business_name=business_name)
-            suppliers = Supplier.objects.filter(business=business)
+            business = business_for(user, business_name)
 
-            alert_items_count = 0
-            for supplier in suppliers:
-                queryset = ItemDetails.objects.filter(supplier=supplier, quantity__lte=F('alert_quantity'))
-                alert_items_count += queryset.count()
+            alert_items_count = cached_result(
+                business.id, 'alert-count', {},
+                lambda: ItemDetails.objects.filter(supplier__business=business, quantity__lte=F('alert_quantity')).count()
+            )
 
             response_data = {"alert_items_count": alert_items_count}
             return Response(response_data, status=status.HTTP_200_OK)
@@ -558,6 +581,21 @@ class CreateUpiDetailsAPIView(generics.CreateAPIView):
         except IntegrityError:
             return Response({"message": "UPI details for this user already exist."}, status=status.HTTP_400_BAD_REQUEST)
 
+def upi_qr_code(upi_details, price, transaction_note):
+    # Returns the UPI payment QR code as a PNG in a buffer.
+    payee_name = quote(upi_details.payee_name)
+    upi_payload = f"upi://pay?pa={upi_details.payee_vpa}&pn={payee_name}&tn={transaction_note}&am={price}&cu=INR"
+    qr = qrcode.QRCode(version=None, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
+    qr.add_data(upi_payload)
+    qr.make(fit=True)
+    qr_code_img = qr.make_image(fill_color="black", back_color="white")
+
+    buffered = BytesIO()
+    qr_code_img.save(buffered)
+    buffered.seek(0)  # Move the buffer position to the beginning
+    return buffered
+
+
 class GenerateQRCodeAPIView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -567,20 +605,10 @@ class GenerateQRCodeAPIView(generics.GenericAPIView):
         user = request.user
         business = Business.objects.filter(Q(owner=user) | Q(businessworker__worker=user)).first()
         upi_details = UpiDetails.objects.get(user=business.owner)
-        payee_name = quote(upi_details.payee_name)
 
         # Generate the UPI QR code
         transaction_note = f"Purchase of Item x price {price}"  # example transaction note
-        upi_payload = f"upi://pay?pa={upi_details.payee_vpa}&pn={payee_name}&tn={transaction_note}&am={price}&cu=INR"
-        qr = qrcode.QRCode(version=None, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
-        qr.add_data(upi_payload)
-        qr.make(fit=True)
-        qr_code_img = qr.make_image(fill_color="black", back_color="white")
-
-        buffered = BytesIO()
-        qr_code_img.save(buffered)
-        buffered.seek(0)  # Move the buffer position to the beginning
-        response = HttpResponse(buffered, content_type='image/png')
+        response = HttpResponse(upi_qr_code(upi_details, price, transaction_note), content_type='image/png')
         return response
         
 
@@ -589,6 +617,7 @@ class UpdateItemQuantityAPIView(generics.UpdateAPIView):
     serializer_class = ItemDetailsSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def update(self, request, *args, **kwargs):
         business_name = request.data.get('business')
         distributor_name = request.data.get('distributors_name')
@@ -602,86 +631,181 @@ class UpdateItemQuantityAPIView(generics.UpdateAPIView):
 
         try:
             user = request.user
-            business = Business.objects.get(Q(owner=user, business_name=business_name) | Q(businessworker__worker=user, business_name=business_name))
+            business = business_for(user, business_name)
             supplier = Supplier.objects.get(business=business, category=category, distributor_name=distributor_name)
-            items = ItemDetails.objects.filter(supplier=supplier, item_name=item_name, item_type=item_type, size=size, unit_of_measurement=uom)
             
             # Check if the user is a worker and tries to add items
             if quantity_delta > 0 and business.owner != user:
                 return Response({"message": "Workers are not permitted to add items."}, status=status.HTTP_403_FORBIDDEN)
 
-            if additional_info:
-                match_found = False
-                for item in items:
-                    additional_info_matched = True
-                    for key, value in additional_info.items():
-                        if not (item.additional_info and key in item.additional_info and item.additional_info[key] == value):
-                            additional_info_matched = False
-                            break
-
-                    if additional_info_matched:
-                        match_found = True
-                        item.quantity += quantity_delta
-                        item.save()
-                        break
-
-                if not match_found:
-                    return Response({"message": "Additional info doesn't match."}, status=status.HTTP_400_BAD_REQUEST)
+            fingerprint = item_fingerprint(supplier.id, item_name, item_type, size, uom, additional_info)
+            item = ItemDetails.objects.select_related('supplier').filter(fingerprint=fingerprint).first()
+            if item is None:
+                # No exact variant: take the first one whose additional_info contains the given keys.
+                items = ItemDetails.objects.select_related('supplier').filter(supplier=supplier, item_name=item_name, item_type=item_type,
+                                                                              size=size, unit_of_measurement=uom)
+                item = matching_variants(items, additional_info).order_by('id').first()
+            if item is None:
+                message = "Additional info doesn't match." if additional_info else "Item not found."
+                return Response({"message": message}, status=status.HTTP_400_BAD_REQUEST)
+
+            if quantity_delta > 0:
+                upi_details = UpiDetails.objects.get(user=business.owner)
 
-            else:
-                item = items.first()
-                item.quantity += quantity_delta
-                item.save()
+            with db_transaction.atomic():
+                if adjust_quantity(item, quantity_delta) is None:
+                    return Response({"message": "Insufficient quantity in stock."}, status=status.HTTP_400_BAD_REQUEST)
+
+                if quantity_delta > 0:  # Item is being added
+                    transaction = Transaction.objects.create(
+                        upi_details=upi_details,
+                        transaction_made_by=request.user,
+                        transaction_id=f"txn-{uuid4()}",
+                        transaction_ref_id=f"tr-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid4()}",
+                        amount=item.price * abs(quantity_delta),
+                        item_id=item.id,
+                        business=business,
+                        unit=abs(quantity_delta),
+                        status='success',
+                        type='added'
+                    )
+                    update_sales_rollup(transaction, None, item)
 
             if quantity_delta < 0:  # Item is being sold
-                if item.quantity + quantity_delta < 0:
-                    response_data = {
-                        "message": "Insufficient quantity in stock.",
-                    }
-                    return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
-                
                 response_data = {
                     "item_id": item.id,
                     "quantity_delta": quantity_delta
                 }
-                return Response(response_data, status=status.HTTP_200_OK)
-
-            else:  # Item is being added
-                # Calculate the total price
-                total_price = item.price * abs(quantity_delta)
-                # Generate transaction_id and transaction_ref_id
-                transaction_id = f"txn-{uuid4()}"
-                transaction_ref_id = f"tr-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid4()}"
-
-                # Create a new transaction object
-                upi_details = UpiDetails.objects.get(user=business.owner)
-                transaction = Transaction.objects.create(
-                    upi_details=upi_details,
-                    transaction_made_by=request.user,
-                    transaction_id=transaction_id,
-                    transaction_ref_id=transaction_ref_id,
-                    amount=total_price,
-                    item_id=item.id,
-                    unit=abs(quantity_delta),
-                    status='success',
-                    type='added'
-                )
+            else:
                 response_data = {
                     "message": "Item quantity updated successfully.",
                     "updated_quantity": item.quantity,
                 }
-                return Response(response_data, status=status.HTTP_200_OK)
+            return Response(response_data, status=status.HTTP_200_OK)
 
         except Exception as e:
             response_data = {"message": str(e)}
             return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BatchUpdateItemQuantityAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    identity_fields = ['category', 'distributors_name', 'item_name', 'item_type', 'size', 'uom']
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        user = request.user
+        business_name = request.data.get('business')
+        lines = request.data.get('lines')
+
+        if not lines or not isinstance(lines, list) or not all(isinstance(line, dict) for line in lines):
+            return Response({"message": "lines must be a non-empty list of objects."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            business = business_for(user, business_name)
+        except Business.DoesNotExist:
+            return Response({"error": "Business does not exist!"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Lines name an item either by item_id or by the same fields as /modify-item-quantity/.
+        suppliers = {
+            (supplier.category, supplier.distributor_name): supplier.id
+            for supplier in Supplier.objects.filter(business=business,
+                                                    category__in={line.get('category') for line in lines},
+                                                    distributor_name__in={line.get('distributors_name') for line in lines})
+        }
+        results = []
+        keys = []
+        for index, line in enumerate(lines):
+            result = {"line": index, "quantity_delta": line.get('quantity_delta')}
+            results.append(result)
+            keys.append(None)
+            delta = line.get('quantity_delta')
+            if not isinstance(delta, int) or isinstance(delta, bool) or delta == 0:
+                result["error"] = "quantity_delta must be a non-zero integer."
+            elif delta > 0 and business.owner != user:
+                result["error"] = "Workers are not permitted to add items."
+            elif line.get('item_id') is not None:
+                try:
+                    keys[index] = ('id', int(line['item_id']))
+                except (TypeError, ValueError):
+                    result["error"] = "item_id must be an integer."
+            elif all(line.get(field) is not None for field in self.identity_fields):
+                supplier_id = suppliers.get((line['category'], line['distributors_name']))
+                if supplier_id is None:
+                    result["error"] = "Supplier does not exist!"
+                    continue
+                try:
+                    keys[index] = ('fingerprint', item_fingerprint(supplier_id, line['item_name'], line['item_type'], line['size'],
+                                                                   line['uom'], line.get('additional_info')))
+                except (TypeError, ValueError):
+                    result["error"] = "size must be a number."
+            else:
+                result["error"] = f"Either item_id or all of {', '.join(self.identity_fields)} are required."
+
+        items = {}
+        for item in ItemDetails.objects.filter(supplier__business=business).filter(
+                Q(pk__in=[key[1] for key in keys if key and key[0] == 'id'])
+                | Q(fingerprint__in=[key[1] for key in keys if key and key[0] == 'fingerprint'])):
+            items[('id', item.id)] = item
+            items[('fingerprint', item.fingerprint)] = item
+
+        deltas = {}
+        for result, key in zip(results, keys):
+            if key is None:
+                continue
+            item = items.get(key)
+            if item is None:
+                result["error"] = "Item not found."
+                continue
+            result["item_id"] = item.id
+            deltas[item.id] = deltas.get(item.id, 0) + result["quantity_delta"]
+
+        if any("error" in result for result in results):
+            return Response({"message": "No quantities were updated.", "results": results}, status=status.HTTP_400_BAD_REQUEST)
+
+        upi_details = None
+        if any(result["quantity_delta"] > 0 for result in results):
+            upi_details = UpiDetails.objects.get(user=business.owner)
+
+        with db_transaction.atomic():
+            quantities, failed = adjust_quantities(deltas)
+            if failed:
+                db_transaction.set_rollback(True)
+                for result in results:
+                    if result["item_id"] in failed:
+                        result["error"] = "Insufficient quantity in stock."
+                return Response({"message": "No quantities were updated.", "results": results}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Restocks are recorded like single updates; bulk_create skips
+            # Transaction.save(), so business is set here.
+            Transaction.objects.bulk_create([
+                Transaction(
+                    upi_details=upi_details,
+                    transaction_made_by=user,
+                    transaction_id=f"txn-{uuid4()}",
+                    transaction_ref_id=f"tr-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid4()}",
+                    amount=items[('id', result["item_id"])].price * result["quantity_delta"],
+                    item_id=result["item_id"],
+                    business=business,
+                    unit=result["quantity_delta"],
+                    status='success',
+                    type='added',
+                )
+                for result in results if result["quantity_delta"] > 0
+            ])
+            invalidate(business.id)
+
+        for result in results:
+            result["updated_quantity"] = quantities[result["item_id"]]
+        return Response({"message": "Item quantities updated successfully.", "results": results}, status=status.HTTP_200_OK)
+
+
 class UpdateTransactionStatusAPIView(generics.UpdateAPIView):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def update(self, request, *args, **kwargs):
         transaction_ids = request.data.get('transaction_ids', [])
         identifier = request.data.get('identifier')
@@ -689,90 +813,119 @@ class UpdateTransactionStatusAPIView(generics.UpdateAPIView):
         if not transaction_ids or not isinstance(transaction_ids, list):
             return Response({"message": "transaction_ids must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
 
-        for transaction_id in transaction_ids:
-            try:
-                transaction = Transaction.objects.get(transaction_id=transaction_id)
-
-                if identifier == 'Y':
-                    transaction.status = 'success'
-                    transaction.save()
-
-                elif identifier == 'N':
-                    transaction.status = 'failed'
-                    transaction.save()
+        if identifier not in ('Y', 'N'):
+            return Response({"message": "Invalid identifier. It should be either 'Y' or 'N'."}, status=status.HTTP_400_BAD_REQUEST)
+        new_status = 'success' if identifier == 'Y' else 'failed'
 
-                    item = ItemDetails.objects.get(id=transaction.item_id)
-                    item.quantity += transaction.unit
-                    item.save()
-
-                else:
-                    return Response({"message": "Invalid identifier. It should be either 'Y' or 'N'."}, status=status.HTTP_400_BAD_REQUEST)
-
-            except Exception as e:
-                response_data = {"message": str(e), "transaction_id": transaction_id}
-                return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
-
-        return Response({"message": "Transaction statuses updated successfully."}, status=status.HTTP_200_OK)
+        with db_transaction.atomic():
+            transactions = {
+                transaction.transaction_id: transaction
+                for transaction in Transaction.objects.select_for_update(of=('self',)).select_related('item__supplier')
+                .filter(transaction_id__in=transaction_ids)
+            }
+            missing = [transaction_id for transaction_id in transaction_ids if transaction_id not in transactions]
+            if missing:
+                results = [
+                    {"transaction_id": transaction_id, "result": "not_found" if transaction_id in missing else "unchanged"}
+                    for transaction_id in transaction_ids
+                ]
+                return Response({"message": "Transaction matching query does not exist.", "results": results},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            changed = [transaction for transaction in transactions.values() if transaction.status != new_status]
+            previous_statuses = {transaction.pk: transaction.status for transaction in changed}
+            Transaction.objects.filter(pk__in=previous_statuses).update(status=new_status, updated_at=timezone.now())
+            for transaction in changed:
+                transaction.status = new_status
+
+            # A sale holds its stock while it is a success, or pending without a
+            # reservation (taken up front, or checked out). Cart sales still
+            # pending only reserved theirs, and a failed sale never holds any,
+            # whether it was restocked or its reservation was swept. So a
+            # confirmation takes the stock unless the sale already held it, and
+            # a failure puts back only what the sale held.
+            reserved = set(StockReservation.objects.filter(transaction__in=changed).values_list('transaction_id', flat=True))
+            StockReservation.objects.filter(transaction__in=changed).delete()
+            deltas = {}
+            for transaction in changed:
+                if transaction.item_id is None:
+                    continue
+                previous_status = previous_statuses[transaction.pk]
+                held = previous_status == 'success' or (previous_status == 'pending' and transaction.pk not in reserved)
+                if new_status == 'success' and not held:
+                    deltas[transaction.item_id] = deltas.get(transaction.item_id, 0) - transaction.unit
+                elif new_status == 'failed' and held:
+                    deltas[transaction.item_id] = deltas.get(transaction.item_id, 0) + transaction.unit
+
+            if new_status == 'failed':
+                add_quantities(deltas)
+            elif deltas:
+                # Guarded like any other sale: the reservation may have expired
+                # and its stock gone to someone else.
+                quantities, failed = adjust_quantities(deltas)
+                if failed:
+                    db_transaction.set_rollback(True)
+                    results = [
+                        {"transaction_id": transaction_id,
+                         "result": "insufficient_stock" if transactions[transaction_id].item_id in failed else "unchanged"}
+                        for transaction_id in transaction_ids
+                    ]
+                    return Response({"message": "Insufficient quantity in stock.", "results": results},
+                                    status=status.HTTP_400_BAD_REQUEST)
+
+            update_sales_rollups(changed, previous_statuses)
+            # update() sends no post_save signals.
+            for business_id in {transaction.business_id or transaction.item.supplier.business_id
+                                for transaction in changed if transaction.business_id or transaction.item}:
+                invalidate(business_id)
+
+        results = [
+            {"transaction_id": transaction_id, "status": transactions[transaction_id].status,
+             "result": "updated" if transactions[transaction_id].pk in previous_statuses else "unchanged"}
+            for transaction_id in transaction_ids
+        ]
+        return Response({"message": "Transaction statuses updated successfully.", "results": results}, status=status.HTTP_200_OK)
 
 
 class ImportExcelDataAPIView(generics.CreateAPIView):
     serializer_class = ItemDetailsSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         try:
-            excel_file = request.FILES['file']
-            df = pd.read_excel(excel_file, sheet_name='Data')
-            added_rows = 0
-            updated_rows = 0
-
-            for row in df.itertuples():
-                business_name = row.Business
-                category = row.Category
-                distributor_name = row._3
-                item_name = row._4
-                item_type = row._5
-                size = row.Size
-                uom = row.Uom
-                quantity = row.Quantity
-                price = row.Price if not pd.isna(row.Price) else 0.00
-                cogs = row.COGS if not pd.isna(row.COGS) else 0.00
-                alert_quantity = row.Alert
-                additional_info_str = row._12
-                imported_date = row.Date.date()
-
-                additional_info = json.loads(additional_info_str)
-
-                business = Business.objects.get(business_name=business_name)
-                supplier, created = Supplier.objects.get_or_create(business=business, category=category, distributor_name=distributor_name)
-
-                items = ItemDetails.objects.filter(supplier=supplier, item_name=item_name, item_type=item_type, size=size, unit_of_measurement=uom)
-                
-
-                existing_item = None
-                for item in items:
-                    if item.additional_info == additional_info:
-                        existing_item = item
-                        break
-                
-                if existing_item:
-                    existing_item.quantity = quantity
-                    existing_item.price = price
-                    existing_item.cogs = cogs
-                    existing_item.alert_quantity = alert_quantity
-                    existing_item.additional_info.update(additional_info)
-                    existing_item.imported_date = imported_date
-                    existing_item.save()
-                
-                    serialized_data = ItemDetailsSerializer(existing_item).data
-                    updated_rows += 1
-                    print(f"Updated row: {item_name} ({updated_rows})")
-                else:
-                    item = ItemDetails.objects.create(supplier=supplier, item_name=item_name, item_type=item_type, size=size, unit_of_measurement=uom, quantity=quantity, price=price, cogs=cogs,  alert_quantity=alert_quantity, additional_info=additional_info, imported_date=imported_date)
-
-                    serialized_data = ItemDetailsSerializer(item).data
-                    added_rows += 1
-                    print(f"Added row: {item_name} ({added_rows})")
+            upload = request.FILES['file']
+            overrides = request.data.get('column_mapping') or {}
+            if isinstance(overrides, str):
+                overrides = json.loads(overrides)
+            mapping = column_mapping(overrides)
+            upload_format = file_format(upload)
+
+            if str(request.data.get('dry_run', '')).lower() == 'true':
+                diff = diff_items(read_rows(upload, upload_format, mapping))
+                return Response({
+                    "status": "success",
+                    "message": "Dry run, nothing was imported.",
+                    "added_rows": len(diff['added']),
+                    "updated_rows": len(diff['updated']),
+                    "untouched_rows": len(diff['untouched']),
+                    **diff,
+                }, status=status.HTTP_200_OK)
+
+            if str(request.data.get('background', '')).lower() == 'true':
+                # Stored and processed by a worker thread; poll /import-jobs/<id>/ for progress.
+                with db_transaction.atomic():
+                    job = ImportJob.objects.create(user=request.user, file=upload, file_format=upload_format,
+                                                   column_mapping=overrides)
+                    submit_import_job(job.id)
+                return Response({"status": "queued", "job_id": job.id}, status=status.HTTP_202_ACCEPTED)
+
+            if upload_format == 'xlsx' and str(request.data.get('stream', '')).lower() != 'true':
+                df = pd.read_excel(upload, sheet_name='Data')
+                added_rows, updated_rows = import_items(parse_excel_rows(df, mapping))
+            else:
+                # CSV, TSV and Parquet are always read in Arrow batches.
+                added_rows, updated_rows = import_items_in_chunks(read_rows(upload, upload_format, mapping))
 
             return Response({"status": "success", "message": "Data imported successfully.", "added_rows": added_rows, "updated_rows": updated_rows}, status=status.HTTP_201_CREATED)
 
@@ -780,6 +933,39 @@ class ImportExcelDataAPIView(generics.CreateAPIView):
             return Response({"status": "failure", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
 
+class ImportJobStatusAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            job = ImportJob.objects.get(pk=pk, user=request.user)
+        except ImportJob.DoesNotExist:
+            return Response({"error": "Import job not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        # The process that was running this job has gone away; pick it up
+        # again from its last committed chunk.
+        if is_stale(job):
+            submit_import_job(job.pk)
+
+        rows_per_second = None
+        if job.started_at:
+            elapsed = ((job.finished_at or timezone.now()) - job.started_at).total_seconds()
+            rows_per_second = round(job.rows_processed / elapsed, 1) if elapsed > 0 else None
+
+        return Response({
+            "job_id": job.id,
+            "status": job.status,
+            "rows_processed": job.rows_processed,
+            "rows_per_second": rows_per_second,
+            "added_rows": job.added_rows,
+            "updated_rows": job.updated_rows,
+            "errors": job.errors,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }, status=status.HTTP_200_OK)
+
+
 class TransactionsByDateView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = TransactionDetailsSerializer
@@ -792,17 +978,115 @@ class TransactionsByDateView(generics.ListAPIView):
         else:
             target_date = date.today()
 
-        queryset = Transaction.objects.filter(created_at__date=target_date, status='success').order_by('-created_at')
+        queryset = Transaction.objects.filter(created_at__date=target_date, status='success') \
+            .select_related('item', 'transaction_made_by', 'upi_details').order_by('-created_at')
 
         if business_name:
-            user = self.request.user
-            business = Business.objects.get(Q(owner=user) | Q(businessworker__worker=user), business_name=business_name)
-            item_ids = ItemDetails.objects.filter(supplier__business=business).values('id')
-            queryset = queryset.filter(item_id__in=Subquery(item_ids))
+            try:
+                business = business_for(self.request.user, business_name)
+            except Business.DoesNotExist:
+                raise ValidationError({"error": "Business does not exist!"})
+            queryset = queryset.filter(business=business)
 
         return queryset
 
 
+class TransactionExportAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def perform_content_negotiation(self, request, force=False):
+        # "format" selects the export format here, not a DRF renderer.
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, *args, **kwargs):
+        user = request.user
+        business_name = request.query_params.get('business_name')
+        export_format = request.query_params.get('format', 'csv')
+        transaction_status = request.query_params.get('status')
+
+        try:
+            start_date = date.fromisoformat(request.query_params['start_date'])
+            end_date = date.fromisoformat(request.query_params.get('end_date', start_date.isoformat()))
+        except KeyError:
+            return Response({"error": "Missing field: start_date"}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"error": "Dates must be in YYYY-MM-DD format."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if export_format not in ('csv', 'ndjson'):
+            return Response({"error": "format must be either csv or ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            business = business_for(user, business_name)
+        except Business.DoesNotExist:
+            return Response({"error": "Business does not exist!"}, status=status.HTTP_400_BAD_REQUEST)
+
+        header = [name for name, lookup in TRANSACTION_COLUMNS]
+        rows = transaction_rows(business, start_date, end_date, transaction_status)
+        filename = f"transactions-{start_date.isoformat()}-{end_date.isoformat()}.{export_format}"
+        if export_format == 'csv':
+            response = StreamingHttpResponse(stream_csv(header, rows), content_type='text/csv')
+        else:
+            response = StreamingHttpResponse(stream_ndjson(header, rows), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ItemCatalogueExportAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def perform_content_negotiation(self, request, force=False):
+        # "format" selects the export format here, not a DRF renderer.
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, *args, **kwargs):
+        user = request.user
+        business_name = request.query_params.get('business_name')
+        export_format = request.query_params.get('format', 'xlsx')
+
+        if export_format not in ('xlsx', 'csv'):
+            return Response({"error": "format must be either xlsx or csv."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            business = business_for(user, business_name)
+        except Business.DoesNotExist:
+            return Response({"error": "Business does not exist!"}, status=status.HTTP_400_BAD_REQUEST)
+
+        filename = f"{business.business_name}-items.{export_format}"
+        if export_format == 'csv':
+            response = StreamingHttpResponse(stream_csv(catalogue_header(), catalogue_rows(business)), content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+
+        workbook = tempfile.TemporaryFile()
+        write_catalogue_xlsx(workbook, business)
+        workbook.seek(0)
+        return FileResponse(workbook, as_attachment=True, filename=filename,
+                            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+
+class ParquetSnapshotAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        business_name = request.query_params.get('business_name')
+        table = request.query_params.get('table', 'transactions')
+
+        if table not in SNAPSHOT_COLUMNS:
+            return Response({"error": f"table must be one of: {', '.join(SNAPSHOT_COLUMNS)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            business = Business.objects.get(owner=request.user, business_name=business_name)
+        except Business.DoesNotExist:
+            return Response({"message": "You must be the owner of this business to export it."}, status=status.HTTP_403_FORBIDDEN)
+
+        # Row groups are written to a temporary file on disk and streamed from there.
+        snapshot = tempfile.TemporaryFile()
+        write_parquet(snapshot, table, business)
+        snapshot.seek(0)
+        return FileResponse(snapshot, as_attachment=True, filename=f"{business.business_name}-{table}.parquet",
+                            content_type='application/vnd.apache.parquet')
+
+
 class SalesPerformanceAPIView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -823,65 +1107,12 @@ class SalesPerformanceAPIView(generics.ListAPIView):
         
         if business:
             business = get_object_or_404(Business, business_name=business)
-            suppliers = Supplier.objects.filter(business=business)
-            items = ItemDetails.objects.filter(supplier__in=suppliers)
-            transactions = Transaction.objects.filter(status='success', type='sold', created_at__gte=start_date, item_id__in=items)
         else:
-            transactions = Transaction.objects.filter(status='success', type='sold', created_at__gte=start_date)
-        sales_data = []
-        
-        total_revenue = 0
-        total_cogs = 0
-        total_profit_loss = 0
-
-        consolidated_data = {}
-
-        for transaction in transactions:
-            item = get_object_or_404(ItemDetails, pk=transaction.item_id)
-            supplier = item.supplier
-            units_sold = transaction.unit
-            revenue = transaction.amount
-            cogs = item.cogs * units_sold
-            profit_loss = revenue - cogs
-            profit_loss_percentage = (profit_loss / revenue) * 100
-
-            total_revenue += revenue
-            total_cogs += cogs
-            total_profit_loss += profit_loss
-
-            item_key = (item.item_name, supplier.distributor_name, supplier.category)
-
-            if item_key not in consolidated_data:
-                consolidated_data[item_key] = {
-                    'item_name': item.item_name,
-                    'distributor': supplier.distributor_name,
-                    'category': supplier.category,
-                    'units_sold': units_sold,
-                    'revenue': revenue,
-                    'cogs': cogs,
-                    'profit_loss': profit_loss,
-                    'profit_loss_percentage': profit_loss_percentage
-                }
-            else:
-                existing_data = consolidated_data[item_key]
-                existing_data['units_sold'] += units_sold
-                existing_data['revenue'] += revenue
-                existing_data['cogs'] += cogs
-                existing_data['profit_loss'] += profit_loss
-                existing_data['profit_loss_percentage'] = (existing_data['profit_loss'] / existing_data['revenue']) * 100
-
-        total_profit_loss_percentage = (total_profit_loss / total_revenue) * 100 if total_revenue != 0 else 0
-        sales_data = list(consolidated_data.values())
-
-        summary_data = {
-            'total_revenue': total_revenue,
-            'total_cogs': total_cogs,
-            'total_profit_loss': total_profit_loss,
-            'total_profit_loss_percentage': total_profit_loss_percentage,
-            'sales_data': sales_data
-        }
+            business = None
 
-        return summary_data
+        business_id = business.id if business else None
+        return cached_result(business_id, 'sales-performance', {'start_date': start_date},
+                             lambda: sales_performance(start_date, business))
 
     def list(self, request, *args, **kwargs):
         summary_data = self.get_queryset()
@@ -894,53 +1125,42 @@ class TopItemsAPIView(generics.ListAPIView):
 
     def list(self, request, *args, **kwargs):
         business = self.request.query_params.get('business')
-        current_year = datetime.now().year
+        metric = self.request.query_params.get('metric', 'units')
+
+        try:
+            limit = int(self.request.query_params.get('limit', 10))
+            year = int(self.request.query_params.get('year', datetime.now().year))
+        except ValueError:
+            return Response({"error": "limit and year must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if metric not in TOP_ITEMS_METRICS:
+            return Response({"error": f"metric must be one of: {', '.join(TOP_ITEMS_METRICS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({"error": "limit must be a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
 
         if business:
             business = get_object_or_404(Business, business_name=business)
-            suppliers = Supplier.objects.filter(business=business)
-            items = ItemDetails.objects.filter(supplier__in=suppliers)
         else:
-            items = self.get_queryset()
-        item_sales = []
-
-        for item in items:
-            units_sold = Transaction.objects.filter(
-                status='success', 
-                type='sold',
-                item_id=item.id,
-                created_at__year=current_year
-            ).aggregate(Sum('unit'))['unit__sum'] or 0
-
-            revenue = units_sold * item.price
-            cogs = units_sold * item.cogs
-            profit_loss = revenue - cogs
-            profit_loss_percentage = (profit_loss / revenue) * 100 if revenue != 0 else 0
-
-            supplier = Supplier.objects.get(id=item.supplier_id)
-
-            item_sales.append({
-                'item_name': item.item_name,
-                'size': item.size,
-                'unit_of_measurement': item.unit_of_measurement,
-                'distributor': supplier.distributor_name,
-                'category': supplier.category,
-                'units_sold': units_sold,
-                'revenue': revenue,
-                'cogs': cogs,
-                'profit_loss': profit_loss,
-                'profit_loss_percentage': profit_loss_percentage,
-            })
+            business = None
 
-        sorted_items = sorted(item_sales, key=lambda x: x['units_sold'], reverse=True)[:10]
+        business_id = business.id if business else None
+        ranked_items = cached_result(business_id, 'top-items', {'year': year, 'metric': metric, 'limit': limit},
+                                     lambda: top_items(year, business, metric=metric, limit=limit))
+        return Response(ranked_items)
 
-        ranked_items = []
-        for rank, item in enumerate(sorted_items, start=1):
-            ranked_item = item.copy()
-            ranked_item['rank'] = rank
-            ranked_items.append(ranked_item)
+class StockoutForecastAPIView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
 
-        return Response(ranked_items)
+    def get(self, request, *args, **kwargs):
+        user = request.user
+        business_name = request.query_params.get('business_name')
+
+        try:
+            business = business_for(user, business_name)
+        except Business.DoesNotExist:
+            return Response({"error": "Business does not exist!"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(stockout_forecast(business), status=status.HTTP_200_OK)
 
 class CartItemListCreateAPIView(generics.ListCreateAPIView):
     serializer_class = CartItemSerializer
@@ -952,66 +1172,66 @@ class CartItemListCreateAPIView(generics.ListCreateAPIView):
         return CartItem.objects.filter(cart=cart)
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
+        queryset = CartItem.objects.filter(cart__user=request.user).select_related('item', 'transaction').order_by('id')
         response_data = []
 
         for cart_item in queryset:
             item = cart_item.item
-            transaction = Transaction.objects.filter(item_id=item.id).last()
+            # A sale that was resolved or swept no longer belongs to the line;
+            # checkout will make a new one.
+            transaction = cart_item.transaction if cart_item.transaction and cart_item.transaction.status == 'pending' else None
             response_data.append({
                 "cart_item_id": cart_item.id,
                 "item": item.item_name,
                 "size": item.size,
-                "unit": transaction.unit,
-                "total_price": transaction.amount,
-                "transaction_id": transaction.transaction_id
+                "unit": cart_item.quantity,
+                "total_price": transaction.amount if transaction else item.price * cart_item.quantity,
+                "transaction_id": transaction.transaction_id if transaction else None
             })
 
         return Response(response_data)
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         item_id = request.data.get('item_id')
-        quantity = request.data.get('quantity', 0)
+        units = request.data.get('quantity')
+        if not isinstance(units, int) or isinstance(units, bool) or units < 1:
+            return Response({"message": "quantity must be a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             user = request.user
             cart, created = Cart.objects.get_or_create(user=user)
-            item = ItemDetails.objects.get(id=item_id)
+            item = ItemDetails.objects.select_related('supplier').get(id=item_id)
+
+            # Create a new transaction object
+            business = Business.objects.filter(Q(owner=user) | Q(businessworker__worker=user)).first()
+            upi_details = UpiDetails.objects.get(user=business.owner)
 
-            if quantity < 0:  # Item is being sold
-                if item.quantity + quantity < 0:
+            with db_transaction.atomic():
+                transaction = Transaction.objects.create(
+                    upi_details=upi_details,
+                    transaction_made_by=request.user,
+                    transaction_id=f"txn-{uuid4()}",
+                    transaction_ref_id=f"tr-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid4()}",
+                    amount=item.price * units,
+                    item_id=item.id,
+                    business_id=item.supplier.business_id,
+                    unit=units,
+                    status='pending',
+                    type='sold'
+                )
+                # Held until the payment is resolved or the reservation expires.
+                reservation = reserve(item, transaction, units)
+                if reservation is None:
                     response_data = {
                         "message": "Insufficient quantity in stock.",
+                        "available_quantity": available_quantity(item),
                     }
+                    db_transaction.set_rollback(True)
                     return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
 
-            cart_item, created = CartItem.objects.get_or_create(cart=cart, item=item, quantity=quantity)
-            if not created:
-                cart_item.quantity += quantity
-            else:
-                cart_item.quantity = quantity
-            cart_item.save()
-
-            # Calculate the total price
-            total_price = item.price * abs(quantity)
-            # Generate transaction_id and transaction_ref_id
-            transaction_id = f"txn-{uuid4()}"
-            transaction_ref_id = f"tr-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid4()}"
-
-            # Create a new transaction object
-            business = Business.objects.filter(Q(owner=user) | Q(businessworker__worker=user)).first()
-            upi_details = UpiDetails.objects.get(user=business.owner)
-            transaction = Transaction.objects.create(
-                upi_details=upi_details,
-                transaction_made_by=request.user,
-                transaction_id=transaction_id,
-                transaction_ref_id=transaction_ref_id,
-                amount=total_price,
-                item_id=item.id,
-                unit=abs(quantity),
-                status='pending',
-                type='sold'
-            )
+                # One line per pending sale, so the listing can read it straight from the line.
+                cart_item = CartItem.objects.create(cart=cart, item=item, quantity=units, transaction=transaction)
 
             response_data = {
                 "message": "Item added.",
@@ -1019,8 +1239,9 @@ class CartItemListCreateAPIView(generics.ListCreateAPIView):
                 "item": item.item_name,
                 "size": item.size,
                 "unit": transaction.unit,
-                "total_price": total_price,
-                "transaction_id": transaction_id
+                "total_price": transaction.amount,
+                "transaction_id": transaction.transaction_id,
+                "reserved_until": reservation.expires_at,
             }
             return Response(response_data, status=status.HTTP_201_CREATED)
 
@@ -1029,6 +1250,94 @@ class CartItemListCreateAPIView(generics.ListCreateAPIView):
             return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
 
 
+class CartCheckoutAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        user = request.user
+        transaction_ref_id = f"tr-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid4()}"
+
+        with db_transaction.atomic():
+            cart_items = list(
+                CartItem.objects.select_for_update(of=('self',)).select_related('item__supplier__business')
+                .filter(cart__user=user).order_by('id')
+            )
+            if not cart_items:
+                return Response({"message": "Cart is empty."}, status=status.HTTP_400_BAD_REQUEST)
+
+            businesses = {cart_item.item.supplier.business for cart_item in cart_items}
+            allowed = set(Business.objects.filter(Q(owner=user) | Q(businessworker__worker=user),
+                                                  pk__in=[business.pk for business in businesses]).values_list('pk', flat=True))
+            if len(allowed) != len(businesses):
+                return Response({"error": "Business does not exist!"}, status=status.HTTP_400_BAD_REQUEST)
+            # One QR pays one payee.
+            if len({business.owner_id for business in businesses}) != 1:
+                return Response({"message": "Cart items must be paid to a single business owner."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            upi_details = UpiDetails.objects.get(user_id=businesses.pop().owner_id)
+
+            # The stock is taken now rather than held, so a failed payment
+            # restocks it like any other sale. Reservations are locked before
+            # their sales, in the same order as the sweeper.
+            linked = [cart_item.transaction_id for cart_item in cart_items if cart_item.transaction_id is not None]
+            StockReservation.objects.filter(transaction__in=linked).delete()
+            # Lines keep the pending sale created when they were added; lines
+            # whose sale was already resolved or swept get a new one.
+            pending = Transaction.objects.select_for_update().filter(pk__in=linked, status='pending').in_bulk()
+            new = [cart_item for cart_item in cart_items if cart_item.transaction_id not in pending]
+
+            deltas = {}
+            for cart_item in cart_items:
+                transaction = pending.get(cart_item.transaction_id)
+                units = transaction.unit if transaction else cart_item.quantity
+                deltas[cart_item.item_id] = deltas.get(cart_item.item_id, 0) - units
+
+            quantities, failed = adjust_quantities(deltas)
+            if failed:
+                db_transaction.set_rollback(True)
+                results = [
+                    {"cart_item_id": cart_item.id, "item_id": cart_item.item_id, "error": "Insufficient quantity in stock."}
+                    for cart_item in cart_items if cart_item.item_id in failed
+                ]
+                return Response({"message": "Cart was not checked out.", "results": results}, status=status.HTTP_400_BAD_REQUEST)
+
+            # bulk_create skips Transaction.save(), so business is set here.
+            created = Transaction.objects.bulk_create([
+                Transaction(
+                    upi_details=upi_details,
+                    transaction_made_by=user,
+                    transaction_id=f"txn-{uuid4()}",
+                    transaction_ref_id=transaction_ref_id,
+                    amount=cart_item.item.price * cart_item.quantity,
+                    item_id=cart_item.item_id,
+                    business_id=cart_item.item.supplier.business_id,
+                    unit=cart_item.quantity,
+                    status='pending',
+                    type='sold',
+                )
+                for cart_item in new
+            ])
+            Transaction.objects.filter(pk__in=pending).update(transaction_ref_id=transaction_ref_id, updated_at=timezone.now())
+            CartItem.objects.filter(pk__in=[cart_item.pk for cart_item in cart_items]).delete()
+            # update() sends no post_save signals.
+            for business_id in {cart_item.item.supplier.business_id for cart_item in cart_items}:
+                invalidate(business_id)
+
+        created = iter(created)
+        transactions = [pending.get(cart_item.transaction_id) or next(created) for cart_item in cart_items]
+        total_amount = sum(transaction.amount for transaction in transactions)
+        qr_code = upi_qr_code(upi_details, total_amount, f"Purchase of {len(cart_items)} cart items")
+        response_data = {
+            "message": "Cart checked out.",
+            "transaction_ref_id": transaction_ref_id,
+            "transaction_ids": [transaction.transaction_id for transaction in transactions],
+            "total_amount": total_amount,
+            "qr_code": base64.b64encode(qr_code.getvalue()).decode(),
+        }
+        return Response(response_data, status=status.HTTP_200_OK)
+
+
 class CartItemRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CartItemSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -1038,6 +1347,44 @@ class CartItemRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView
         cart = Cart.objects.get(user=user)
         return CartItem.objects.filter(cart=cart)
 
+    def update(self, request, *args, **kwargs):
+        quantity = request.data.get('quantity')
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            return Response({"message": "quantity must be a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        instance = self.get_object()
+        with db_transaction.atomic():
+            cart_item = CartItem.objects.select_for_update(of=('self',)).select_related('item').get(pk=instance.pk)
+            # The line's pending sale and its reservation change with it.
+            transaction = Transaction.objects.select_for_update().filter(pk=cart_item.transaction_id, status='pending').first()
+            if transaction is not None:
+                reservation = StockReservation.objects.select_for_update().filter(transaction=transaction).first()
+                if reservation is None:
+                    return Response({"message": "This line's stock has already been taken; remove it and add it again."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                if not resize(reservation, quantity):
+                    response_data = {
+                        "message": "Insufficient quantity in stock.",
+                        "available_quantity": available_quantity(cart_item.item)
+                        + (reservation.quantity if reservation.expires_at > timezone.now() else 0),
+                    }
+                    return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
+                Transaction.objects.filter(pk=transaction.pk).update(unit=quantity, amount=cart_item.item.price * quantity,
+                                                                     updated_at=timezone.now())
+            cart_item.quantity = quantity
+            cart_item.save(update_fields=['quantity'])
+
+        return Response(self.get_serializer(cart_item).data)
+
+    def perform_destroy(self, instance):
+        # A removed line's sale is abandoned: release its stock and fail it.
+        with db_transaction.atomic():
+            if instance.transaction_id is not None:
+                StockReservation.objects.filter(transaction_id=instance.transaction_id).delete()
+                Transaction.objects.filter(pk=instance.transaction_id, status='pending') \
+                    .update(status='failed', updated_at=timezone.now())
+            instance.delete()
+
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()